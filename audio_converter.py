@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Conversión por lotes desde la línea de comandos (sin interfaz gráfica).
+
+Uso:
+    python -m audio_converter convert SRC... --format opus --jobs N
+    python -m audio_converter convert SRC... -f flac -f mp3 -f opus
+    python -m audio_converter resume
+
+SRC puede ser un archivo o una carpeta (se recorre recursivamente).
+El progreso se escribe en stdout como JSON, un objeto por línea.
+No importa Qt ni yt-dlp, de modo que funciona en servidores y en cron.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import List, Optional
+
+import quality_presets as qp
+from job_journal import JobJournal
+from job_manifest import JobManifest
+from task_trace import TaskTrace, summarize
+from convert_engine import (
+    AUDIO_EXTENSIONS, ConvertEngine, build_fanout_tasks, default_job_count,
+    find_ffmpeg, find_ffprobe, iter_audio_files, parse_extensions, remove_stale_partials
+)
+
+
+class JsonLinesReporter:
+    """Escribe eventos como JSON lines; seguro para llamarlo desde varios hilos"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        fields = {"event": event, **fields}
+        line = json.dumps(fields, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def collect_inputs(sources: List[str], exts=AUDIO_EXTENSIONS) -> List[str]:
+    """Expande carpetas y elimina duplicados conservando el orden"""
+    seen = set()
+    inputs = []
+    for src in sources:
+        paths = iter_audio_files(src, exts) if os.path.isdir(src) else [src]
+        for p in paths:
+            p = os.path.abspath(p)
+            if p not in seen:
+                seen.add(p)
+                inputs.append(p)
+    return inputs
+
+
+def params_from_args(args: argparse.Namespace) -> dict:
+    """Mismos parámetros que construye MainWindow.build_tasks"""
+    if args.quality == "custom":
+        return {
+            "bitrate_k": args.bitrate,
+            "vbr_q": args.vbr_q,
+            "samplerate": args.samplerate,
+            "channels": args.channels,
+            "use_soxr": not args.no_soxr,
+            "mode": "custom",
+            "copy_meta": not args.no_meta
+        }
+    return {"mode": "max", "copy_meta": not args.no_meta}
+
+
+def find_tools(args: argparse.Namespace):
+    # find_ffmpeg/find_ffprobe informan por stdout: no mezclarlo con el JSON
+    with redirect_stdout(sys.stderr):
+        ffmpeg = args.ffmpeg or find_ffmpeg()
+        ffprobe = args.ffprobe or find_ffprobe()
+    return ffmpeg, ffprobe
+
+
+def cmd_convert(args: argparse.Namespace) -> int:
+    out = JsonLinesReporter()
+
+    ffmpeg, ffprobe = find_tools(args)
+    if not ffmpeg or not ffprobe:
+        out.emit("error", message="No se encontró FFmpeg/FFprobe")
+        return 2
+
+    inputs = collect_inputs(args.sources, parse_extensions(args.extensions) or AUDIO_EXTENSIONS)
+    missing = [p for p in inputs if not os.path.isfile(p)]
+    for p in missing:
+        out.emit("error", input=p, message="Archivo no encontrado")
+    if missing:
+        skip = set(missing)
+        inputs = [p for p in inputs if p not in skip]
+
+    out_root = args.output
+    Path(out_root).mkdir(parents=True, exist_ok=True)
+    tasks = build_fanout_tasks(inputs, out_root, args.format, params_from_args(args),
+                               smart_copy=not args.no_smart_copy)
+
+    manifest = JobManifest(out_root) if args.incremental else None
+    code = run_tasks(out, tasks, ffmpeg, ffprobe, args, out_root, manifest=manifest, dedupe=args.dedupe)
+    return code if code or not missing else 1
+
+
+def cmd_resume(args: argparse.Namespace) -> int:
+    """Repite las tareas que el último lote (de la CLI o de la interfaz) dejó sin terminar"""
+    out = JsonLinesReporter()
+
+    ffmpeg, ffprobe = find_tools(args)
+    if not ffmpeg or not ffprobe:
+        out.emit("error", message="No se encontró FFmpeg/FFprobe")
+        return 2
+
+    journal = JobJournal.latest()
+    tasks = JobJournal.unfinished_tasks(journal) if journal else []
+    missing = [t["input"] for t in tasks if not os.path.isfile(t["input"])]
+    for p in missing:
+        out.emit("error", input=p, message="Archivo no encontrado")
+    tasks = [t for t in tasks if os.path.isfile(t["input"])]
+    if not tasks:
+        out.emit("finished", ok=0, failed=0, elapsed=0.0)
+        return 1 if missing else 0
+    remove_stale_partials(tasks)
+    code = run_tasks(out, tasks, ffmpeg, ffprobe, args, str(Path(tasks[0]["output"]).parent))
+    return code if code or not missing else 1
+
+
+def run_tasks(out: JsonLinesReporter, tasks: List[dict], ffmpeg: str, ffprobe: str,
+              args: argparse.Namespace, out_root: str, **engine_kw) -> int:
+    """Ejecuta el lote informando en JSON lines; devuelve el código de salida"""
+    results = {"ok": 0, "failed": 0}
+
+    def on_progress(idx: int, pct: float):
+        out.emit("progress", index=idx, percent=round(pct, 1))
+
+    def on_file_done(idx: int, ok: bool, message: str):
+        results["ok" if ok else "failed"] += 1
+        task = tasks[idx]
+        fields = {"timing": engine.timings[idx]} if idx in engine.timings else {}
+        out.emit("done", index=idx, input=task["input"], output=task["output"], ok=ok, message=message, **fields)
+
+    try:
+        journal = JobJournal()
+    except OSError as e:
+        journal = None  # se convierte igual, pero el lote no se podrá reanudar
+        print(f"No se pudo crear el diario de trabajos: {e}", file=sys.stderr)
+    try:
+        trace = TaskTrace()
+    except OSError as e:
+        trace = None  # los tiempos siguen saliendo en los eventos "done"
+        print(f"No se pudo crear la traza de tiempos: {e}", file=sys.stderr)
+
+    engine = ConvertEngine(tasks, ffmpeg, ffprobe, max_jobs=args.jobs, journal=journal, trace=trace,
+                           on_progress=on_progress, on_file_done=on_file_done, **engine_kw)
+
+    out.emit("start", total=len(tasks), format=getattr(args, "format", None), jobs=engine.max_jobs, output=out_root,
+             trace=str(trace.path) if trace else None)
+    started = time.monotonic()
+
+    # El motor corre en otro hilo; Ctrl+C solo le pide que pare y se espera a que
+    # termine de verdad (join() tras un join interrumpido no espera en Python 3.10/3.11)
+    finished = threading.Event()
+    interrupted = []
+
+    def run_engine():
+        try:
+            engine.run()
+        finally:
+            finished.set()
+
+    def on_sigint(signum, frame):
+        # Un segundo Ctrl+C mientras se cierran los ffmpeg no hace nada más
+        interrupted.append(signum)
+        engine.stop()
+
+    previous = signal.signal(signal.SIGINT, on_sigint)
+    try:
+        threading.Thread(target=run_engine, name="convert-engine").start()
+        while not finished.wait(0.2):
+            pass
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    if interrupted:
+        out.emit("cancelled")
+
+    out.emit("finished", ok=results["ok"], failed=results["failed"],
+             elapsed=round(time.monotonic() - started, 3), timing=summarize(list(engine.timings.values())))
+    if engine.is_stopped():
+        return 130
+    return 0 if results["failed"] == 0 else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="audio_converter", description="Audio Converter por línea de comandos")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    conv = sub.add_parser("convert", help="Convierte archivos o carpetas")
+    conv.add_argument("sources", nargs="+", metavar="SRC", help="Archivos o carpetas de entrada")
+    conv.add_argument("--format", "-f", required=True, action="append", choices=sorted(qp.EXT_FOR_FORMAT),
+                      help="Formato destino; se puede repetir (-f flac -f mp3) para producir varios "
+                           "a la vez, cada uno en su subcarpeta")
+    conv.add_argument("--output", "-o", default=str(Path.cwd() / "output"), help="Carpeta de salida")
+    conv.add_argument("--jobs", "-j", type=int, default=default_job_count(),
+                      help="Conversiones simultáneas (por defecto, una por núcleo)")
+    conv.add_argument("--quality", choices=["max", "custom"], default="max",
+                      help="max = calidad máxima (recomendada); custom usa los parámetros siguientes")
+    conv.add_argument("--bitrate", type=int, default=320, help="Bitrate en kbps (custom)")
+    conv.add_argument("--vbr-q", type=int, default=0, help="Calidad VBR, 0 = mejor (custom)")
+    conv.add_argument("--samplerate", type=int, default=0, help="Sample rate en Hz, 0 = mantener (custom)")
+    conv.add_argument("--channels", type=int, default=0, help="Canales, 0 = mantener (custom)")
+    conv.add_argument("--no-soxr", action="store_true", help="No usar resampling SOXR (custom)")
+    conv.add_argument("--no-smart-copy", action="store_true", help="Recodificar siempre")
+    conv.add_argument("--no-meta", action="store_true", help="No copiar metadatos ni carátula")
+    conv.add_argument("--extensions", default="",
+                      help="Extensiones a buscar en carpetas, p. ej. \"flac,wav\" (por defecto, todas las de audio)")
+    conv.add_argument("--incremental", action="store_true", help="Omitir salidas que siguen al día")
+    conv.add_argument("--dedupe", action="store_true",
+                      help="Convertir una vez los archivos idénticos y enlazar (o copiar) el resto")
+    conv.add_argument("--ffmpeg", help="Ruta a ffmpeg (por defecto, detección automática)")
+    conv.add_argument("--ffprobe", help="Ruta a ffprobe (por defecto, detección automática)")
+    conv.set_defaults(func=cmd_convert)
+
+    res = sub.add_parser("resume", help="Reanuda el último lote interrumpido")
+    res.add_argument("--jobs", "-j", type=int, default=default_job_count(),
+                     help="Conversiones simultáneas (por defecto, una por núcleo)")
+    res.add_argument("--ffmpeg", help="Ruta a ffmpeg (por defecto, detección automática)")
+    res.add_argument("--ffprobe", help="Ruta a ffprobe (por defecto, detección automática)")
+    res.set_defaults(func=cmd_resume)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks reproducibles del análisis, la construcción de comandos y la
+conversión.
+
+Uso:
+    python benchmarks/bench.py run -o resultados.json [--quick] [--baseline base.json]
+    python benchmarks/bench.py compare base.json resultados.json [--threshold 10]
+
+Los archivos de prueba se generan en local con las fuentes lavfi de ffmpeg
+(seno y ruido rosa con semilla fija), en todos los formatos de
+qp.SUPPORTED_FORMATS_DISPLAY y con varias duraciones y sample rates. Nada
+se descarga ni depende de la biblioteca del usuario: el caché de análisis
+se sustituye por uno temporal durante la ejecución.
+
+Cada métrica se guarda con su unidad y con el sentido en que es mejor, de
+modo que compare marca como regresión cualquier empeoramiento mayor que el
+umbral y devuelve 1 si encuentra alguna.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import quality_presets as qp  # noqa: E402
+from convert_engine import build_tasks, default_job_count, find_ffmpeg, find_ffprobe  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+# Codificador con el que se genera cada formato de prueba (no el de la aplicación:
+# los fixtures deben ser los mismos aunque cambien los presets)
+FIXTURE_CODECS = {
+    "wav": ["-c:a", "pcm_s16le"],
+    "flac": ["-c:a", "flac"],
+    "alac": ["-c:a", "alac"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "192k"],
+    "aac": ["-c:a", "aac", "-b:a", "192k"],
+    "opus": ["-c:a", "libopus", "-b:a", "128k"],
+    "vorbis": ["-c:a", "libvorbis", "-q:a", "5"],
+}
+
+# Rejilla de fixtures: (duraciones en segundos, sample rates)
+FULL_GRID = ([5, 60, 300], [44100, 48000, 96000])
+QUICK_GRID = ([3, 20], [44100, 48000])
+
+DEFAULT_TARGETS = ["mp3", "flac", "opus"]
+DEFAULT_THRESHOLD = 10.0  # % de empeoramiento que se considera regresión
+
+
+class Results:
+    """Métricas de una ejecución: nombre -> valor, unidad y sentido en que es mejor"""
+
+    def __init__(self):
+        self.metrics: Dict[str, dict] = {}
+
+    def add(self, name: str, value: float, unit: str, better: str = "lower"):
+        self.metrics[name] = {"value": round(value, 6), "unit": unit, "better": better}
+        print(f"  {name:<42} {value:>14.3f} {unit}", file=sys.stderr)
+
+
+def timed_median(func: Callable[[], None], repeat: int) -> float:
+    """Mediana en segundos de repetir func; la mediana aguanta mejor los picos del sistema"""
+    samples = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+# --- Fixtures ---
+
+def make_fixtures(ffmpeg: str, folder: Path, grid) -> List[dict]:
+    """Genera (o reutiliza) un archivo por formato, duración y sample rate"""
+    folder.mkdir(parents=True, exist_ok=True)
+    durations, rates = grid
+    fixtures = []
+    for fmt_display in qp.SUPPORTED_FORMATS_DISPLAY:
+        fmt_key = qp.DISPLAY_TO_KEY[fmt_display]
+        for duration in durations:
+            for rate in rates:
+                # Alterna seno y ruido: el ruido es el peor caso para los codificadores
+                kind = "noise" if len(fixtures) % 2 else "sine"
+                path = folder / f"{fmt_key}_{rate}_{duration}s_{kind}{qp.EXT_FOR_FORMAT[fmt_key]}"
+                if not path.exists():
+                    if kind == "sine":
+                        source = f"sine=frequency=440:sample_rate={rate}:duration={duration}"
+                    else:
+                        source = f"anoisesrc=color=pink:sample_rate={rate}:duration={duration}:amplitude=0.3:seed=1"
+                    cmd = [ffmpeg, "-v", "error", "-y", "-f", "lavfi", "-i", source, "-ac", "2",
+                           *FIXTURE_CODECS[fmt_key], str(path)]
+                    subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+                fixtures.append({"path": str(path), "format": fmt_key, "duration": duration, "rate": rate})
+    return fixtures
+
+
+# --- Benchmarks ---
+
+def bench_probe(results: Results, ffprobe: str, paths: List[str], workdir: Path, repeat: int):
+    """MetadataCache en frío (ffprobe), en caliente en memoria y en caliente desde disco"""
+    store = qp.ProbeStore(workdir / "probe_cache.sqlite3")
+    cache = qp.MetadataCache(store=store)
+    start = time.perf_counter()
+    for p in paths:
+        cache.get_or_probe(ffprobe, p)
+    cold = time.perf_counter() - start
+    results.add("probe.cold_ms_per_file", cold * 1000 / len(paths), "ms")
+    results.add("probe.cold_spawns_per_file", cache.stats()["probe_spawns"] / len(paths), "procesos")
+
+    def warm_memory():
+        for p in paths:
+            cache.get_or_probe(ffprobe, p)
+    warm = timed_median(warm_memory, repeat)
+    results.add("probe.warm_memory_us_per_file", warm * 1e6 / len(paths), "us")
+
+    def warm_disk():
+        # Caché nuevo en memoria sobre el mismo almacén: como al abrir otra vez la aplicación
+        fresh = qp.MetadataCache(store=store)
+        for p in paths:
+            fresh.get_or_probe(ffprobe, p)
+    disk = timed_median(warm_disk, repeat)
+    results.add("probe.warm_disk_us_per_file", disk * 1e6 / len(paths), "us")
+    store.close()
+
+
+def bench_codec_args(results: Results, ffprobe: str, paths: List[str], params: dict, repeat: int):
+    """qp.build_codec_args por formato destino, con los metadatos ya en caché"""
+    for fmt_display in qp.SUPPORTED_FORMATS_DISPLAY:
+        fmt_key = qp.DISPLAY_TO_KEY[fmt_display]
+
+        def build():
+            for p in paths:
+                qp.build_codec_args(fmt_key, params, ffprobe, p)
+        elapsed = timed_median(build, repeat)
+        results.add(f"codec_args.{fmt_key}.us_per_call", elapsed * 1e6 / len(paths), "us")
+
+
+def bench_stream_copy(results: Results, ffprobe: str, fixtures: List[dict], params: dict, repeat: int):
+    """qp.can_stream_copy: proporción de copias directas y coste por consulta"""
+    pairs = []
+    for fx in fixtures:
+        for fmt_display in qp.SUPPORTED_FORMATS_DISPLAY:
+            fmt_key = qp.DISPLAY_TO_KEY[fmt_display]
+            out_f = str(Path(fx["path"]).with_suffix(qp.EXT_FOR_FORMAT[fmt_key]))
+            pairs.append((fx, fmt_key, out_f))
+
+    copies = [qp.can_stream_copy(fx["path"], out_f, ffprobe, fmt_key, params) for fx, fmt_key, out_f in pairs]
+    same = [copy for copy, (fx, fmt_key, _) in zip(copies, pairs) if fx["format"] == fmt_key]
+    results.add("stream_copy.hit_rate", sum(copies) / len(pairs), "fracción", better="higher")
+    # Toda entrada convertida a su mismo formato debería copiarse sin recodificar
+    results.add("stream_copy.same_format_hit_rate", sum(same) / max(1, len(same)), "fracción", better="higher")
+
+    def check():
+        for fx, fmt_key, out_f in pairs:
+            qp.can_stream_copy(fx["path"], out_f, ffprobe, fmt_key, params)
+    elapsed = timed_median(check, repeat)
+    results.add("stream_copy.us_per_call", elapsed * 1e6 / len(pairs), "us")
+
+
+def bench_convert(results: Results, ffmpeg: str, ffprobe: str, fixtures: List[dict], targets: List[str],
+                  params: dict, jobs: int, workdir: Path):
+    """ConvertWorker de principio a fin: archivos por segundo y factor de tiempo real"""
+    from PySide6.QtCore import QCoreApplication, QEvent
+    from main import ConvertWorker
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    inputs = [fx["path"] for fx in fixtures]
+    source_seconds = sum(fx["duration"] for fx in fixtures)
+
+    for fmt_key in targets:
+        out_root = workdir / f"out_{fmt_key}"
+        shutil.rmtree(out_root, ignore_errors=True)
+        tasks = build_tasks(inputs, str(out_root), fmt_key, params, smart_copy=True)
+        failed = []
+
+        worker = ConvertWorker(tasks, ffmpeg, ffprobe, max_jobs=jobs)
+        worker.file_done.connect(lambda idx, ok, msg: failed.append(idx) if not ok else None)
+        worker.all_done.connect(app.quit)
+        start = time.perf_counter()
+        worker.start()
+        app.exec()
+        worker.wait()
+        wall = time.perf_counter() - start
+        # Liberar cada hilo al terminar su formato en vez de acumularlos hasta la salida
+        worker.deleteLater()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        app.processEvents()
+
+        if failed:
+            print(f"  {fmt_key}: {len(failed)} conversión(es) fallida(s)", file=sys.stderr)
+        results.add(f"convert.{fmt_key}.wall_s", wall, "s")
+        results.add(f"convert.{fmt_key}.files_per_s", len(tasks) / wall, "archivos/s", better="higher")
+        results.add(f"convert.{fmt_key}.realtime_factor", source_seconds / wall, "x", better="higher")
+        results.add(f"convert.{fmt_key}.failures", len(failed), "archivos")
+        shutil.rmtree(out_root, ignore_errors=True)
+
+
+def ffmpeg_version(ffmpeg: str) -> str:
+    try:
+        out = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True, timeout=10).stdout
+        return out.splitlines()[0] if out else ""
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run_suite(args: argparse.Namespace) -> dict:
+    # find_ffmpeg/find_ffprobe informan por stdout: no mezclarlo con el JSON
+    with redirect_stdout(sys.stderr):
+        ffmpeg = args.ffmpeg or find_ffmpeg()
+        ffprobe = args.ffprobe or find_ffprobe()
+    if not ffmpeg or not ffprobe:
+        raise SystemExit("No se encontró FFmpeg/FFprobe")
+
+    workdir = Path(tempfile.mkdtemp(prefix="audio_converter_bench_"))
+    fixture_dir = Path(args.fixtures) if args.fixtures else workdir / "fixtures"
+    grid = QUICK_GRID if args.quick else FULL_GRID
+    params = {"mode": "max", "copy_meta": True}
+    results = Results()
+
+    # Caché de análisis propio: no tocar el del usuario y empezar siempre en frío
+    user_cache = qp._metadata_cache
+    qp._metadata_cache = qp.MetadataCache()
+    try:
+        print("Generando fixtures…", file=sys.stderr)
+        start = time.perf_counter()
+        fixtures = make_fixtures(ffmpeg, fixture_dir, grid)
+        print(f"  {len(fixtures)} archivos en {time.perf_counter() - start:.1f} s", file=sys.stderr)
+        paths = [fx["path"] for fx in fixtures]
+
+        print("Análisis (MetadataCache)", file=sys.stderr)
+        bench_probe(results, ffprobe, paths, workdir, args.repeat)
+        # Los benchmarks siguientes miden el cálculo, no ffprobe: caché global ya caliente
+        for p in paths:
+            qp._metadata_cache.get_or_probe(ffprobe, p)
+
+        print("Construcción de argumentos (build_codec_args)", file=sys.stderr)
+        bench_codec_args(results, ffprobe, paths, params, args.repeat)
+
+        print("Copia directa (can_stream_copy)", file=sys.stderr)
+        bench_stream_copy(results, ffprobe, fixtures, params, args.repeat)
+
+        if not args.skip_convert:
+            print(f"Conversión (ConvertWorker, {args.jobs} trabajos)", file=sys.stderr)
+            bench_convert(results, ffmpeg, ffprobe, fixtures, args.targets, params, args.jobs, workdir)
+    finally:
+        qp._metadata_cache = user_cache
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": ffmpeg_version(ffmpeg),
+            "grid": "quick" if args.quick else "full",
+            "fixtures": len(fixtures),
+            "source_seconds": sum(fx["duration"] for fx in fixtures),
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+            "targets": args.targets,
+        },
+        "metrics": results.metrics,
+    }
+
+
+# --- Comparación ---
+
+def load_results(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("schema") != SCHEMA_VERSION:
+        raise SystemExit(f"{path}: versión de resultados no compatible ({data.get('schema')})")
+    return data
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> int:
+    """Tabla de cambios frente a la referencia; devuelve el número de regresiones"""
+    if baseline["meta"].get("grid") != current["meta"].get("grid"):
+        print("Aviso: las dos ejecuciones usan rejillas de fixtures distintas", file=sys.stderr)
+    if baseline["meta"].get("platform") != current["meta"].get("platform"):
+        print("Aviso: las dos ejecuciones son de máquinas o sistemas distintos", file=sys.stderr)
+
+    regressions = 0
+    print(f"{'métrica':<42} {'referencia':>12} {'actual':>12} {'cambio':>9}")
+    for name, cur in current["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if base is None:
+            print(f"{name:<42} {'-':>12} {cur['value']:>12.3f} {'nueva':>9}")
+            continue
+        if base["value"]:
+            change = (cur["value"] - base["value"]) * 100 / abs(base["value"])
+        else:
+            change = 0.0 if not cur["value"] else float("inf")
+        worse = change if cur["better"] == "lower" else -change
+        mark = ""
+        if worse > threshold:
+            mark = "  ✗ regresión"
+            regressions += 1
+        elif worse < -threshold:
+            mark = "  ✓ mejora"
+        print(f"{name:<42} {base['value']:>12.3f} {cur['value']:>12.3f} {change:>+8.1f}%{mark}")
+    for name in baseline["metrics"]:
+        if name not in current["metrics"]:
+            print(f"{name:<42} {baseline['metrics'][name]['value']:>12.3f} {'-':>12} {'quitada':>9}")
+    print(f"\n{regressions} regresión(es) por encima del {threshold:g}%")
+    return regressions
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    data = run_suite(args)
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.baseline:
+        return 1 if compare_results(load_results(args.baseline), data, args.threshold) else 0
+    return 0
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    regressions = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    return 1 if regressions else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="bench", description="Benchmarks de Audio Converter")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Ejecuta la suite y guarda los resultados en JSON")
+    run.add_argument("--output", "-o", help="Archivo JSON de resultados (por defecto, stdout)")
+    run.add_argument("--quick", action="store_true", help="Rejilla de fixtures reducida (menos de un minuto)")
+    run.add_argument("--fixtures", help="Carpeta donde generar y reutilizar los fixtures (por defecto, temporal)")
+    run.add_argument("--repeat", type=int, default=5, help="Repeticiones de las mediciones cortas (mediana)")
+    run.add_argument("--jobs", "-j", type=int, default=default_job_count(), help="Conversiones simultáneas")
+    run.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS, choices=sorted(qp.EXT_FOR_FORMAT),
+                     help="Formatos destino de la conversión de principio a fin")
+    run.add_argument("--skip-convert", action="store_true", help="Omitir la conversión de principio a fin")
+    run.add_argument("--baseline", help="Comparar al terminar con estos resultados de referencia")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                     help="Empeoramiento en %% que cuenta como regresión")
+    run.add_argument("--ffmpeg", help="Ruta a ffmpeg (por defecto, detección automática)")
+    run.add_argument("--ffprobe", help="Ruta a ffprobe (por defecto, detección automática)")
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser("compare", help="Compara dos archivos de resultados")
+    cmp_.add_argument("baseline", help="Resultados de referencia")
+    cmp_.add_argument("current", help="Resultados nuevos")
+    cmp_.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                      help="Empeoramiento en %% que cuenta como regresión")
+    cmp_.set_defaults(func=cmd_compare)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    code = main()
+    # El código de salida es lo que lee CI (1 = regresión): salir sin finalizar el
+    # intérprete, donde PySide6 6.12 puede abortar al recolectar True/False (bool_dealloc)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
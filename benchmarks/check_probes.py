@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Comprobación de que cada entrada se analiza una sola vez por lote.
+
+Uso:
+    python benchmarks/check_probes.py [--ffmpeg RUTA] [--ffprobe RUTA]
+
+Genera con lavfi un archivo corto por formato de qp.SUPPORTED_FORMATS_DISPLAY,
+los convierte a varios formatos a la vez (fan-out) con un caché de análisis
+nuevo y sin almacén en disco, y comprueba que MetadataCache.probe_spawns es
+exactamente el número de entradas: ni la precarga, ni la elección de copia
+directa, ni cada formato de salida deben lanzar otro ffprobe.
+Devuelve 1 si no se cumple o si alguna conversión falla.
+"""
+import sys
+import shutil
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import quality_presets as qp  # noqa: E402
+from bench import make_fixtures  # noqa: E402
+from convert_engine import ConvertEngine, build_fanout_tasks, find_ffmpeg, find_ffprobe  # noqa: E402
+
+# Una duración y un sample rate: un fixture por formato de entrada
+GRID = ([2], [44100])
+TARGETS = ["mp3", "flac", "opus"]
+
+
+def check(ffmpeg: str, ffprobe: str, workdir: Path) -> bool:
+    inputs = [fx["path"] for fx in make_fixtures(ffmpeg, workdir / "fixtures", GRID)]
+    tasks = build_fanout_tasks(inputs, str(workdir / "out"), TARGETS, {"mode": "max", "copy_meta": True})
+    failed = []
+
+    user_cache = qp._metadata_cache
+    qp._metadata_cache = qp.MetadataCache()
+    try:
+        engine = ConvertEngine(tasks, ffmpeg, ffprobe,
+                               on_file_done=lambda idx, ok, msg: failed.append((idx, msg)) if not ok else None)
+        engine.run()
+        spawns = qp._metadata_cache.stats()["probe_spawns"]
+    finally:
+        qp._metadata_cache = user_cache
+
+    print(f"{len(inputs)} entradas, {len(tasks)} salidas, {spawns} análisis con ffprobe")
+    for idx, msg in failed:
+        print(f"  ✗ {tasks[idx]['output']}: {msg.splitlines()[-1] if msg else ''}")
+    if spawns != len(inputs):
+        print(f"✗ Se esperaba un análisis por entrada ({len(inputs)})")
+    return spawns == len(inputs) and not failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="check_probes", description="Un ffprobe por entrada y lote")
+    parser.add_argument("--ffmpeg", help="Ruta a ffmpeg (por defecto, detección automática)")
+    parser.add_argument("--ffprobe", help="Ruta a ffprobe (por defecto, detección automática)")
+    args = parser.parse_args(argv)
+
+    with redirect_stdout(sys.stderr):
+        ffmpeg = args.ffmpeg or find_ffmpeg()
+        ffprobe = args.ffprobe or find_ffprobe()
+    if not ffmpeg or not ffprobe:
+        raise SystemExit("No se encontró FFmpeg/FFprobe")
+
+    workdir = Path(tempfile.mkdtemp(prefix="audio_converter_probes_"))
+    try:
+        return 0 if check(ffmpeg, ffprobe, workdir) else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1319 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de conversión independiente de la interfaz.
+No importa Qt ni yt-dlp: lo usan tanto la ventana principal (main.py)
+como la línea de comandos (audio_converter.py).
+"""
+import os
+import json
+import mmap
+import hashlib
+import heapq
+import sys
+import time
+import shutil
+import queue
+import subprocess
+from collections import OrderedDict, deque
+from itertools import islice
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from threading import Condition, Event, Lock, Thread
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import quality_presets as qp
+from job_journal import JobJournal
+from job_manifest import JobManifest, ffmpeg_version, task_fingerprint
+from task_trace import TaskTrace
+
+# Extensiones que se consideran audio al añadir carpetas
+AUDIO_EXTENSIONS = {".wav",".aiff",".aif",".flac",".mp3",".m4a",".aac",".ogg",".opus",".wma",".mka",".mkv",".mp4",".mov"}
+
+# Tamaño de bloque al enviar una descarga por la tubería hacia ffmpeg
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Mensaje de on_file_done para las salidas que el modo incremental no rehace
+SKIPPED_MESSAGE = "sin cambios (omitido)"
+
+# Comienzo del mensaje de on_file_done para las salidas enlazadas a un duplicado
+DUPLICATE_MESSAGE = "contenido duplicado"
+
+# Mensaje de on_file_done para los trabajos interrumpidos por stop()
+CANCELLED_MESSAGE = "cancelado"
+
+# Bloque de lectura al calcular el hash de una entrada (deduplicación)
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Cada cuánto informa ffmpeg del progreso (segundos, -stats_period)
+PROGRESS_PERIOD = 1.0
+
+# ---------------------------
+# Utilities
+# ---------------------------
+
+def default_job_count() -> int:
+    """Número de conversiones simultáneas por defecto: una por núcleo."""
+    return max(1, os.cpu_count() or 1)
+
+
+def find_ffmpeg() -> Optional[str]:
+    """
+    Return path to ffmpeg executable.
+    Priority: local ./bin/ffmpeg(.exe) then PATH.
+    """
+    # 1. Local bin dentro del ejecutable (PyInstaller _MEIPASS)
+    local_bin = Path(getattr(sys, "_MEIPASS", Path.cwd())) / "bin"
+    for candidate in ["ffmpeg.exe", "ffmpeg"]:
+        p = local_bin / candidate
+        if p.exists():
+            print(f"✓ FFmpeg encontrado en _MEIPASS: {p}")
+            return str(p)
+    
+    # 2. Carpeta bin junto al ejecutable (para distribución)
+    if getattr(sys, 'frozen', False):
+        # Estamos en ejecutable, buscar en carpeta del .exe
+        exe_dir = Path(sys.executable).parent / "bin"
+        for candidate in ["ffmpeg.exe", "ffmpeg"]:
+            p = exe_dir / candidate
+            if p.exists():
+                print(f"✓ FFmpeg encontrado junto al ejecutable: {p}")
+                return str(p)
+    
+    # 3. PATH del sistema
+    exe = shutil.which("ffmpeg")
+    if exe:
+        print(f"✓ FFmpeg encontrado en PATH: {exe}")
+        return exe
+
+    # 4. Windows PATH try common installs
+    if os.name == "nt":
+        common = [
+            r"C:\ffmpeg\bin\ffmpeg.exe",
+            r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
+            r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe",
+        ]
+        for c in common:
+            if os.path.exists(c):
+                print(f"✓ FFmpeg encontrado en ubicación común: {c}")
+                return c
+    
+    print("❌ FFmpeg NO encontrado en ninguna ubicación")
+    return None
+
+
+def find_ffprobe() -> Optional[str]:
+    """
+    Return path to ffprobe executable.
+    Mirror logic of find_ffmpeg.
+    """
+    # 1. Local bin dentro del ejecutable (PyInstaller _MEIPASS)
+    local_bin = Path(getattr(sys, "_MEIPASS", Path.cwd())) / "bin"
+    for candidate in ["ffprobe.exe", "ffprobe"]:
+        p = local_bin / candidate
+        if p.exists():
+            print(f"✓ FFprobe encontrado en _MEIPASS: {p}")
+            return str(p)
+    
+    # 2. Carpeta bin junto al ejecutable (para distribución)
+    if getattr(sys, 'frozen', False):
+        exe_dir = Path(sys.executable).parent / "bin"
+        for candidate in ["ffprobe.exe", "ffprobe"]:
+            p = exe_dir / candidate
+            if p.exists():
+                print(f"✓ FFprobe encontrado junto al ejecutable: {p}")
+                return str(p)
+    
+    # 3. PATH del sistema
+    exe = shutil.which("ffprobe")
+    if exe:
+        print(f"✓ FFprobe encontrado en PATH: {exe}")
+        return exe
+
+    # 4. Windows common locations
+    if os.name == "nt":
+        common = [
+            r"C:\ffmpeg\bin\ffprobe.exe",
+            r"C:\Program Files\ffmpeg\bin\ffprobe.exe",
+            r"C:\Program Files (x86)\ffmpeg\bin\ffprobe.exe",
+        ]
+        for c in common:
+            if os.path.exists(c):
+                print(f"✓ FFprobe encontrado en ubicación común: {c}")
+                return c
+    
+    print("❌ FFprobe NO encontrado en ninguna ubicación")
+    return None
+
+
+def probe_audio_meta(ffprobe_path: str, fpath: str) -> dict:
+    """
+    Return metadata for the first audio stream.
+    Goes through the shared probe cache, so no extra ffprobe is spawned.
+    """
+    return qp._metadata_cache.get_stream_info(ffprobe_path, fpath)
+
+
+def duration_seconds(ffprobe_path: str, fpath: str) -> float:
+    """
+    Fetch format duration for progress computation (shared probe cache).
+    """
+    return qp._metadata_cache.get_duration(ffprobe_path, fpath)
+
+
+def parse_extensions(text: str) -> set:
+    """"flac, .MP3 wav" -> {".flac", ".mp3", ".wav"}"""
+    exts = set()
+    for token in text.replace(",", " ").replace(";", " ").split():
+        token = token.strip().lower()
+        if token:
+            exts.add(token if token.startswith(".") else "." + token)
+    return exts
+
+
+def iter_audio_files(folder: str, exts: Iterable[str] = AUDIO_EXTENSIONS,
+                     should_stop: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+    """
+    Recorre una carpeta recursivamente con os.scandir y devuelve los archivos
+    con extensión de audio. Las carpetas sin permiso se saltan; no se siguen
+    enlaces a carpetas (evita ciclos). should_stop permite abandonar a mitad.
+    """
+    exts = {e.lower() for e in exts}
+    pending = [folder]
+    while pending:
+        if should_stop is not None and should_stop():
+            return
+        try:
+            it = os.scandir(pending.pop())
+        except OSError:
+            continue
+        subdirs = []
+        files = []
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in exts and entry.is_file():
+                        files.append(entry.path)
+                except OSError:
+                    continue
+        # Orden alfabético de archivos y carpetas: el orden de scandir depende del sistema
+        # de archivos, y de este orden dependen los nombres de salida repetidos ("(2)")
+        yield from sorted(files)
+        pending.extend(sorted(subdirs, reverse=True))
+
+
+def content_hash(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> Optional[str]:
+    """blake2b del contenido leyendo el archivo mapeado en memoria por bloques"""
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return h.hexdigest()  # mmap no admite archivos vacíos
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for start in range(0, len(mm), chunk_size):
+                        h.update(view[start:start + chunk_size])
+                finally:
+                    view.release()
+    except (OSError, ValueError):
+        return None
+    return h.hexdigest()
+
+
+def mark_duplicates(tasks: List[dict], max_workers: int = qp.PREFETCH_WORKERS) -> int:
+    """
+    Busca entradas con el mismo contenido entre las tareas: primero agrupa por
+    tamaño y solo calcula el hash de los archivos que coinciden en tamaño.
+    La primera tarea de cada grupo se convierte; las demás reciben
+    task["clone_of"] = índice de esa tarea. Devuelve cuántas son copias.
+    """
+    by_size = {}
+    for idx, task in enumerate(tasks):
+        if "source" in task or "clone_of" in task:
+            continue
+        try:
+            size = os.stat(task["input"]).st_size
+        except OSError:
+            continue
+        # Solo son intercambiables si además se convierten con los mismos ajustes
+        settings = json.dumps([task["codec"], task["params"], task.get("smart_copy", True)], sort_keys=True)
+        by_size.setdefault((size, settings), []).append(idx)
+
+    candidates = [idx for group in by_size.values() if len(group) > 1 for idx in group]
+    if not candidates:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="hash") as pool:
+        hashes = dict(zip(candidates, pool.map(lambda i: content_hash(tasks[i]["input"]), candidates)))
+
+    clones = 0
+    for (size, settings), group in by_size.items():
+        primary = {}
+        for idx in group:
+            digest = hashes.get(idx)
+            if digest is None:
+                continue
+            if digest in primary:
+                tasks[idx]["clone_of"] = primary[digest]
+                clones += 1
+            else:
+                primary[digest] = idx
+    return clones
+
+
+def partial_path(output: str) -> str:
+    """Nombre temporal (oculto, misma carpeta y extensión) mientras se escribe output"""
+    p = Path(output)
+    return str(p.with_name(f".{p.stem}.partial{p.suffix}"))
+
+
+def unique_output(output: str, taken: set) -> str:
+    """
+    Devuelve output o, si otra tarea del lote ya escribe ahí, "nombre (2).ext",
+    "nombre (3).ext"…, y lo reserva en taken. Las salidas van todas a la misma
+    carpeta, así que a/01.flac y b/01.flac chocarían (y con trabajos en
+    paralelo escribirían a la vez el mismo archivo temporal).
+    """
+    key = os.path.normcase(os.path.abspath(output))
+    if key in taken:
+        p = Path(output)
+        n = 2
+        while True:
+            candidate = str(p.with_name(f"{p.stem} ({n}){p.suffix}"))
+            key = os.path.normcase(os.path.abspath(candidate))
+            if key not in taken:
+                output = candidate
+                break
+            n += 1
+    taken.add(key)
+    return output
+
+
+def remove_stale_partials(tasks: Iterable[dict]) -> int:
+    """
+    Borra las salidas temporales que dejó un lote interrumpido (cierre
+    forzado, corte de luz) para las tareas que se van a repetir.
+    Devuelve cuántas se borraron.
+    """
+    removed = 0
+    for task in tasks:
+        try:
+            os.remove(partial_path(task["output"]))
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"No se pudo borrar la salida temporal de {task['output']}: {e}", file=sys.stderr)
+    return removed
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """Crea dst como enlace duro a src (o copia si el sistema no lo permite)"""
+    Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "enlazado"
+    except OSError:
+        tmp = partial_path(dst)
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+        return "copiado"
+
+
+def build_tasks(inputs: Iterable[str], out_root: str, fmt_key: str, params: dict, smart_copy: bool = True) -> List[dict]:
+    """Construye la lista de tareas de conversión hacia out_root"""
+    ext = qp.EXT_FOR_FORMAT[fmt_key]
+    tasks = []
+    for in_f in inputs:
+        rel = os.path.splitext(Path(in_f).name)[0] + ext
+        tasks.append({
+            "input": in_f,
+            "output": str(Path(out_root) / rel),
+            "codec": fmt_key,
+            "params": params,
+            "smart_copy": smart_copy
+        })
+    return tasks
+
+
+def build_fanout_tasks(inputs: Iterable[str], out_root: str, fmt_keys: List[str], params: dict,
+                       smart_copy: bool = True) -> List[dict]:
+    """
+    Tareas para varios formatos a la vez: cada formato va a su subcarpeta
+    (out_root/<formato>/) y las tareas de una misma entrada comparten la
+    clave "group", de modo que el motor las produce con un solo ffmpeg.
+    Con un único formato equivale a build_tasks.
+    """
+    fmt_keys = list(dict.fromkeys(fmt_keys))
+    if len(fmt_keys) == 1:
+        return build_tasks(inputs, out_root, fmt_keys[0], params, smart_copy)
+    tasks = []
+    for group, in_f in enumerate(inputs):
+        for fmt_key in fmt_keys:
+            task = build_tasks([in_f], str(Path(out_root) / fmt_key), fmt_key, params, smart_copy)[0]
+            task["group"] = group
+            tasks.append(task)
+    return tasks
+
+
+# Extensiones (según yt-dlp) de contenedores que ffmpeg puede leer por una tubería
+STREAMABLE_EXTS = {"webm", "weba", "mka", "mkv", "ogg", "oga", "opus", "mp3", "flac", "wav", "aac"}
+
+
+class ProgressAggregator:
+    """
+    Agrupa el progreso de los trabajos en curso. Los hilos de conversión
+    escriben con update(); quien pinta la interfaz llama a snapshot() a
+    ritmo fijo y recibe solo el último valor de cada trabajo.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._active = {}  # índice -> porcentaje
+        self._changed = False
+
+    def update(self, idx: int, pct: float):
+        with self._lock:
+            self._active[idx] = pct
+            self._changed = True
+
+    def finish(self, idx: int):
+        with self._lock:
+            if self._active.pop(idx, None) is not None:
+                self._changed = True
+
+    def snapshot(self) -> Optional[dict]:
+        """Progreso de los trabajos en curso, o None si nada cambió desde la última vez"""
+        with self._lock:
+            if not self._changed:
+                return None
+            self._changed = False
+            return dict(self._active)
+
+
+class BatchProgress:
+    """
+    Progreso global de un lote ponderado por la duración de cada entrada
+    (un audiolibro de 2 horas pesa más que una sintonía de 10 segundos) y
+    tiempo restante según el ritmo reciente: segundos de audio convertidos
+    por segundo de reloj, sumando todos los trabajos en curso.
+    Las duraciones que aún no se conocen cuentan como la media de las conocidas,
+    igual en lo terminado que en el total, y se corrigen al ir llegando.
+    """
+    WINDOW_S = 30.0  # ventana del ritmo para la estimación
+
+    def __init__(self, total: int, durations: Dict[int, float]):
+        self.total = total  # tareas del lote (en modo streaming va creciendo)
+        self._durations = durations  # índice -> segundos (lo rellena el motor)
+        self._seen = 0  # entradas de durations ya contadas (el dict conserva el orden de llegada)
+        self._known = 0  # duraciones positivas conocidas
+        self._known_sum = 0.0
+        self._mean = 1.0
+        self._done = {}  # índice -> convertida (False si se omitió o era duplicada)
+        self._pending = set()  # terminadas cuya duración aún no se conoce
+        # Terminadas: segundos conocidos y número de las que cuentan como la media
+        self._done_sum, self._done_unknown = 0.0, 0
+        self._skipped_sum, self._skipped_unknown = 0.0, 0
+        self._active = {}  # índice -> porcentaje de las tareas en curso
+        self._samples = deque()  # (instante, segundos convertidos)
+
+    def _refresh(self):
+        # Solo se recorren las duraciones nuevas: con lotes grandes llegan una a una
+        if self._seen == len(self._durations):
+            return
+        new = list(islice(self._durations.items(), self._seen, None))
+        self._seen += len(new)
+        for idx, seconds in new:
+            if seconds <= 0:
+                continue
+            self._known += 1
+            self._known_sum += seconds
+            if idx in self._pending:
+                self._pending.discard(idx)
+                self._count_done(idx, seconds, -1)
+        self._mean = self._known_sum / self._known if self._known else 1.0
+
+    def _count_done(self, idx: int, seconds: float, unknown: int):
+        # Suma a lo terminado segundos conocidos y tareas sin duración (cuentan como la media)
+        self._done_sum += seconds
+        self._done_unknown += unknown
+        if not self._done[idx]:
+            self._skipped_sum += seconds
+            self._skipped_unknown += unknown
+
+    def _weight(self, idx: int) -> float:
+        seconds = self._durations.get(idx)
+        return seconds if seconds and seconds > 0 else self._mean
+
+    def _total_seconds(self) -> float:
+        self._refresh()
+        return self._known_sum + self._mean * max(0, self.total - self._known)
+
+    def _done_seconds(self) -> float:
+        return self._done_sum + self._done_unknown * self._mean
+
+    def _skipped_seconds(self) -> float:
+        return self._skipped_sum + self._skipped_unknown * self._mean
+
+    def update(self, active: Dict[int, float]):
+        """Porcentaje de las tareas en curso (la instantánea de ProgressAggregator)"""
+        self._active = {idx: pct for idx, pct in active.items() if idx not in self._done}
+        self._sample()
+
+    def finish(self, idx: int, converted: bool = True):
+        """Tarea terminada; converted=False si no hubo que convertirla (no cuenta para el ritmo)"""
+        if idx in self._done:
+            return
+        self._refresh()
+        self._done[idx] = converted
+        self._active.pop(idx, None)
+        seconds = self._durations.get(idx)
+        if seconds and seconds > 0:
+            self._count_done(idx, seconds, 0)
+        else:
+            # Se corrige en _refresh cuando llegue su duración
+            self._pending.add(idx)
+            self._count_done(idx, 0.0, 1)
+        self._sample()
+
+    def _converted_seconds(self) -> float:
+        self._refresh()
+        partial = sum(self._weight(idx) * pct / 100.0 for idx, pct in self._active.items())
+        return self._done_seconds() - self._skipped_seconds() + partial
+
+    def _sample(self):
+        now = time.monotonic()
+        self._samples.append((now, self._converted_seconds()))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.WINDOW_S:
+            self._samples.popleft()
+
+    def fraction(self) -> float:
+        """Parte del audio del lote ya terminada, de 0 a 1"""
+        total = self._total_seconds()
+        if total <= 0:
+            return 0.0
+        done = self._skipped_seconds() + self._converted_seconds()
+        return min(1.0, done / total)
+
+    def rate(self) -> Optional[float]:
+        """Segundos de audio convertidos por segundo de reloj en la ventana reciente"""
+        if len(self._samples) < 2:
+            return None
+        (t0, s0), (t1, s1) = self._samples[0], self._samples[-1]
+        if t1 - t0 < 1.0 or s1 <= s0:
+            return None
+        return (s1 - s0) / (t1 - t0)
+
+    def eta(self) -> Optional[float]:
+        """Segundos que faltan al ritmo actual, o None si aún no hay ritmo"""
+        rate = self.rate()
+        if rate is None:
+            return None
+        remaining = self._total_seconds() * (1.0 - self.fraction())
+        return remaining / rate
+
+
+class LongestFirstQueue:
+    """
+    Trabajos pendientes de un lote repartidos de más largo a más corto
+    (duración por número de salidas): así el más largo no empieza al final
+    y alarga todo el lote. Las duraciones llegan de la precarga de metadatos
+    (caché en disco o ffprobe) mientras el lote ya trabaja: known() pasa los
+    trabajos de esa entrada al montículo y pop() elige el más largo de todos
+    los pendientes con duración conocida. Si aún no se conoce ninguna, sale
+    el primero de la cola, así el lote empieza sin esperar a los análisis.
+    Seguro para llamarlo desde varios hilos.
+    """
+
+    def __init__(self, jobs: List[List[Tuple[int, dict]]]):
+        self._lock = Lock()
+        self._heap = []  # (-segundos, posición en la cola, trabajo)
+        self._unknown = OrderedDict()  # posición -> trabajo, en el orden de la cola
+        self._by_input = {}  # entrada -> posiciones de sus trabajos
+        for pos, members in enumerate(jobs):
+            self._unknown[pos] = members
+            self._by_input.setdefault(members[0][1]["input"], []).append(pos)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._heap) + len(self._unknown)
+
+    def known(self, fpath: str, seconds: float) -> List[List[Tuple[int, dict]]]:
+        """Duración de una entrada; devuelve sus trabajos aún pendientes"""
+        with self._lock:
+            positions = [pos for pos in self._by_input.pop(fpath, []) if pos in self._unknown]
+            pending = [self._unknown[pos] for pos in positions]
+            # Sin duración válida siguen esperando en su sitio de la cola
+            if seconds > 0:
+                for pos, members in zip(positions, pending):
+                    del self._unknown[pos]
+                    heapq.heappush(self._heap, (-seconds * len(members), pos, members))
+        return pending
+
+    def pop(self) -> Optional[List[Tuple[int, dict]]]:
+        with self._lock:
+            if self._heap:
+                return heapq.heappop(self._heap)[2]
+            if self._unknown:
+                return self._unknown.popitem(last=False)[1]
+            return None
+
+
+class AdaptiveSlots:
+    """
+    Huecos para procesos ffmpeg simultáneos. El límite parte de max_jobs y se
+    ajusta con la CPU que consumen de verdad los trabajos terminados (CPU del
+    proceso hijo / tiempo real, medido con os.wait4): si cada trabajo ocupa
+    un núcleo entero, uno por núcleo; si esperan a disco o red, hasta
+    max_jobs. Sin medidas (Windows) se queda en max_jobs.
+    """
+    SMOOTHING = 0.3  # peso de cada medida nueva en la media móvil
+    MIN_SAMPLE_S = 0.5  # los trabajos más cortos no dan una medida fiable
+
+    def __init__(self, max_jobs: int, cores: Optional[int] = None):
+        self.max_jobs = max_jobs
+        self.cores = max(1, cores or os.cpu_count() or 1)
+        self.limit = max_jobs
+        self.running = 0
+        self.waiting = 0  # trabajos que aún esperan hueco (si se conocen)
+        self.utilization: Optional[float] = None  # núcleos por trabajo (media móvil)
+        self._cond = Condition()
+
+    def acquire(self, should_stop: Callable[[], bool]) -> bool:
+        """Espera un hueco; devuelve False si se cancela mientras tanto"""
+        with self._cond:
+            while self.running >= self.limit:
+                if should_stop():
+                    return False
+                self._cond.wait(0.5)
+            self.running += 1
+            self.waiting = max(0, self.waiting - 1)
+            return True
+
+    def release(self, timing: Optional[dict] = None):
+        with self._cond:
+            self.running -= 1
+            if timing is not None:
+                self._measure(timing)
+            self._cond.notify_all()
+
+    def _measure(self, timing: dict):
+        wall = timing.get("encode_s") or 0.0
+        if wall < self.MIN_SAMPLE_S or "cpu_user_s" not in timing:
+            return
+        util = (timing["cpu_user_s"] + timing.get("cpu_sys_s", 0.0)) / wall
+        if self.utilization is None:
+            self.utilization = util
+        else:
+            self.utilization += self.SMOOTHING * (util - self.utilization)
+        self.limit = max(1, min(self.max_jobs, round(self.cores / max(self.utilization, 0.05))))
+
+    def threads_per_job(self) -> int:
+        """Núcleos que le tocan a cada trabajo contando los que van a correr a la vez"""
+        with self._cond:
+            busy = min(self.limit, self.running + self.waiting)
+            return max(1, self.cores // max(1, busy))
+
+
+class HttpStreamSource:
+    """
+    Audio remoto que se convierte sin pasar por disco: el motor abre la URL
+    cuando la tarea empieza y envía los bytes a ffmpeg por stdin.
+    """
+
+    def __init__(self, url: str, headers: Optional[dict] = None, timeout: float = 30,
+                 on_complete: Optional[Callable[[], None]] = None):
+        self.url = url
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        # Se llama (desde el hilo de conversión) cuando la salida se ha producido bien
+        self.on_complete = on_complete
+
+    def open(self):
+        req = urllib.request.Request(self.url, headers=self.headers)
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+
+def build_stream_task(name: str, source: HttpStreamSource, probe: "qp.ProbeRecord", out_root: str,
+                      fmt_key: str, params: dict, smart_copy: bool = True) -> dict:
+    """
+    Tarea de conversión desde una fuente remota. 'input' es solo una etiqueta
+    (y la clave del caché de metadatos); 'probe' sustituye al análisis con ffprobe.
+    """
+    # name ya viene sin extensión: no pasar por splitext, que cortaría títulos
+    # con puntos ("Mr. Brightside" -> "Mr")
+    return {
+        "input": f"{source.url}#{name}",
+        "output": str(Path(out_root) / (name + qp.EXT_FOR_FORMAT[fmt_key])),
+        "codec": fmt_key,
+        "params": params,
+        "smart_copy": smart_copy,
+        "source": source,
+        "probe": probe,
+        "label": name,
+    }
+
+
+# ---------------------------
+# Conversion Engine
+# ---------------------------
+
+class ConvertEngine:
+    """
+    Motor de conversión sin dependencias de Qt.
+    Ejecuta las tareas en un pool de procesos ffmpeg y notifica mediante
+    callbacks: on_progress(index, percent) y on_file_done(index, ok, message).
+    Los callbacks se invocan desde los hilos del pool.
+
+    Con dedupe=True (solo por lotes) las entradas de contenido idéntico se
+    convierten una vez; las demás salidas se enlazan o copian de la primera.
+
+    Con streaming=True las tareas llegan mientras el motor ya trabaja:
+    submit() las encola (bloquea si la cola está llena) y close() indica que
+    no habrá más; run() vuelve cuando se han procesado todas.
+    """
+    # Tareas en espera como máximo en modo streaming (además de las que se ejecutan)
+    STREAM_QUEUE_SIZE = 8
+
+    def __init__(self, tasks: List[dict], ffmpeg_path: str, ffprobe_path: str, max_jobs: Optional[int] = None,
+                 manifest: Optional[JobManifest] = None,
+                 on_progress: Optional[Callable[[int, float], None]] = None,
+                 on_file_done: Optional[Callable[[int, bool, str], None]] = None,
+                 streaming: bool = False, dedupe: bool = False, journal: Optional[JobJournal] = None,
+                 trace: Optional[TaskTrace] = None):
+        self.tasks = tasks
+        self.dedupe = dedupe
+        # Diario del lote para poder reanudarlo tras una interrupción
+        self.journal = journal
+        # Desglose de tiempos de cada tarea ejecutada (índice -> registro), y su traza en disco
+        self.trace = trace
+        self.timings: Dict[int, dict] = {}
+        # Duración de cada entrada (índice -> segundos) según se conoce, para ponderar el progreso
+        self.durations: Dict[int, float] = {}
+        self._queued_at: Dict[int, float] = {}
+        # Salidas ya asignadas en el lote (normalizadas), para que no haya dos tareas con la misma
+        self._outputs = set()
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        # Número de procesos ffmpeg simultáneos (por defecto, uno por núcleo)
+        self.max_jobs = max(1, int(max_jobs or default_job_count()))
+        # Modo incremental: omite las salidas que siguen al día
+        self.manifest = manifest
+        self._fingerprints = {}
+        self.on_progress = on_progress or (lambda idx, pct: None)
+        self.on_file_done = on_file_done or (lambda idx, ok, msg: None)
+        self._stop = False
+        self._stop_lock = Lock()
+        # Procesos ffmpeg en ejecución, para poder cancelarlos desde stop()
+        self._procs = set()
+        self._procs_lock = Lock()
+        # Modo streaming: cola acotada de tareas entrantes
+        self._feed: Optional[queue.Queue] = queue.Queue(self.STREAM_QUEUE_SIZE) if streaming else None
+        # Fin de la entrada en modo streaming; no pasa por la cola para que close() no bloquee
+        self._closed = Event()
+        self._tasks_lock = Lock()
+        self._prefetch = ThreadPoolExecutor(max_workers=qp.PREFETCH_WORKERS, thread_name_prefix="ffprobe") if streaming else None
+        # Cuántos ffmpeg corren a la vez (como mucho max_jobs) y con cuántos hilos
+        self._slots = AdaptiveSlots(self.max_jobs)
+
+    def stop(self):
+        with self._stop_lock:
+            self._stop = True
+        # Cancelar también los trabajos que ya están en marcha
+        with self._procs_lock:
+            running = list(self._procs)
+        for proc in running:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+    
+    def is_stopped(self) -> bool:
+        with self._stop_lock:
+            return self._stop
+
+    def _spawn(self, cmd: List[str], **kwargs) -> subprocess.Popen:
+        """Lanza un proceso y lo registra para que stop() pueda terminarlo"""
+        proc = subprocess.Popen(cmd, **kwargs)
+        with self._procs_lock:
+            self._procs.add(proc)
+        # stop() pudo llegar justo antes de registrar el proceso
+        if self.is_stopped():
+            proc.terminate()
+        return proc
+
+    def _release(self, proc: subprocess.Popen):
+        with self._procs_lock:
+            self._procs.discard(proc)
+
+    def submit(self, task: dict) -> Optional[int]:
+        """
+        Modo streaming: añade una tarea y devuelve su índice.
+        Bloquea mientras la cola esté llena, frenando al productor.
+        Tras stop() la tarea se descarta y devuelve None.
+        """
+        if self.is_stopped():
+            return None
+        with self._tasks_lock:
+            idx = len(self.tasks)
+            task["output"] = unique_output(task["output"], self._outputs)
+            self.tasks.append(task)
+        self._queued_at[idx] = time.monotonic()
+        if self.journal is not None:
+            self.journal.queued(idx, task)
+        # Empezar a analizar el archivo mientras espera turno
+        if "source" not in task:
+            try:
+                self._prefetch.submit(qp._metadata_cache.get_or_probe, self.ffprobe_path, task["input"])
+            except RuntimeError:
+                pass  # el lote se detuvo mientras tanto: la tarea ya no se ejecutará
+        while not self.is_stopped():
+            try:
+                self._feed.put((idx, task), timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        return idx
+
+    def close(self):
+        """Modo streaming: no llegarán más tareas (no bloquea; run() termina al vaciar la cola)"""
+        self._closed.set()
+
+    def run(self):
+        """Ejecuta todas las tareas y vuelve cuando han terminado (o se ha cancelado)"""
+        if self._feed is not None:
+            self._run_streaming()
+            return
+
+        # Antes de anotar nada en el diario: las salidas repetidas reciben otro nombre
+        for task in self.tasks:
+            task["output"] = unique_output(task["output"], self._outputs)
+
+        if self.dedupe:
+            mark_duplicates(self.tasks)
+
+        if self.journal is not None:
+            for idx, task in enumerate(self.tasks):
+                self.journal.queued(idx, task)
+
+        pending = list(enumerate(self.tasks))
+        queued = time.monotonic()
+        self._queued_at = {idx: queued for idx, _ in pending}
+        if self.manifest is not None:
+            pending = self._skip_up_to_date(pending)
+
+        jobs = self._jobs(pending)
+        order = LongestFirstQueue(jobs)
+
+        def probed(fpath: str, record: "qp.ProbeRecord"):
+            for members in order.known(fpath, record.duration):
+                for idx, _ in members:
+                    self.durations.setdefault(idx, record.duration)
+
+        # Precarga de metadatos: analiza toda la cola mientras arrancan las primeras conversiones;
+        # cada duración que llega reordena los trabajos pendientes
+        prefetch = qp._metadata_cache.prefetch(
+            self.ffprobe_path, [t["input"] for _, t in pending if "source" not in t and "clone_of" not in t],
+            on_ready=probed)
+        try:
+            workers = min(self.max_jobs, max(1, len(pending)))
+            self._slots.waiting = len(jobs)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ffmpeg") as pool:
+                # Primero los originales; las copias esperan a su original (ya en marcha: no hay bloqueo)
+                futures = {}
+                # El siguiente trabajo se elige al quedar libre un hueco, con las duraciones de ese momento
+                while order and self._slots.acquire(self.is_stopped):
+                    members = order.pop()
+                    if len(members) == 1:
+                        fut = pool.submit(self._run_task, *members[0])
+                    else:
+                        fut = pool.submit(self._run_group, members)
+                    fut.add_done_callback(lambda _f, idx=members[0][0]: self._slots.release(self.timings.get(idx)))
+                    for idx, _ in members:
+                        futures[idx] = fut
+                clones = [pool.submit(self._run_clone, idx, task, futures.get(task["clone_of"]))
+                          for idx, task in pending if "clone_of" in task]
+                for fut in list(futures.values()) + clones:
+                    fut.result()
+        finally:
+            prefetch.shutdown(wait=False, cancel_futures=True)
+            if self.manifest is not None:
+                self.manifest.close()
+            if self.journal is not None:
+                self.journal.close()
+            if self.trace is not None:
+                self.trace.close()
+
+    @staticmethod
+    def _jobs(pending: List[Tuple[int, dict]]) -> List[List[Tuple[int, dict]]]:
+        """
+        Agrupa las tareas con la misma clave "group" (varios formatos de una
+        entrada) en un único trabajo; el resto va cada una por su cuenta.
+        """
+        jobs = []
+        groups = {}
+        for idx, task in pending:
+            if "clone_of" in task:
+                continue
+            key = task.get("group")
+            if key is None:
+                jobs.append([(idx, task)])
+            elif key in groups:
+                groups[key].append((idx, task))
+            else:
+                groups[key] = [(idx, task)]
+                jobs.append(groups[key])
+        return jobs
+
+    def _run_streaming(self):
+        # Un hueco por proceso ffmpeg: solo se saca de la cola lo que puede empezar ya
+        slots = self._slots
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="ffmpeg") as pool:
+                while not self.is_stopped():
+                    try:
+                        item = self._feed.get(timeout=0.5)
+                    except queue.Empty:
+                        # close() llega después de la última submit(): cola vacía y cerrada = fin
+                        if self._closed.is_set():
+                            break
+                        continue
+                    if not slots.acquire(self.is_stopped):
+                        break
+                    fut = pool.submit(self._run_task, *item)
+                    fut.add_done_callback(lambda _f, idx=item[0]: slots.release(self.timings.get(idx)))
+        finally:
+            self._prefetch.shutdown(wait=False, cancel_futures=True)
+            if self.journal is not None:
+                self.journal.close()
+            if self.trace is not None:
+                self.trace.close()
+
+    def _skip_up_to_date(self, pending: List[Tuple[int, dict]]) -> List[Tuple[int, dict]]:
+        """Modo incremental: da por terminadas las tareas cuya salida sigue siendo válida"""
+        version = ffmpeg_version(self.ffmpeg_path)
+        remaining = []
+        for idx, task in pending:
+            fp = task_fingerprint(task, version)
+            self._fingerprints[idx] = fp
+            if self.manifest.is_up_to_date(task["output"], fp):
+                self._done(idx, True, SKIPPED_MESSAGE)
+            else:
+                remaining.append((idx, task))
+        return remaining
+
+    def _run_clone(self, idx: int, task: dict, primary: Optional[Future]) -> bool:
+        """Reutiliza la salida de la tarea con el mismo contenido; si falló, convierte"""
+        primary_ok = primary.result() if primary is not None else True
+        if self.is_stopped():
+            return False
+        src = self.tasks[task["clone_of"]]["output"]
+        if primary_ok and os.path.exists(src):
+            try:
+                if src == task["output"]:
+                    how = "misma salida que"
+                else:
+                    how = link_or_copy(src, task["output"]) + " de"
+                if self.manifest is not None:
+                    self.manifest.record(task["output"], self._fingerprints.get(idx))
+                self.on_progress(idx, 100.0)
+                self._done(idx, True, f"{DUPLICATE_MESSAGE}: {how} {os.path.basename(src)}")
+                return True
+            except OSError:
+                pass
+        # Conversión propia: ocupa un hueco como cualquier otro trabajo
+        if not self._slots.acquire(self.is_stopped):
+            return False
+        try:
+            return self._run_task(idx, task)
+        finally:
+            self._slots.release(self.timings.get(idx))
+
+    def _run_task(self, idx: int, task: dict) -> bool:
+        # Los trabajos en cola se descartan si se ha cancelado
+        if self.is_stopped():
+            return False
+        if self.journal is not None:
+            self.journal.running(idx)
+        self._start_timing(idx)
+        try:
+            ok, message = self._convert(idx, task)
+            if ok and self.manifest is not None:
+                self.manifest.record(task["output"], self._fingerprints.get(idx))
+            source = task.get("source")
+            if ok and source is not None and source.on_complete is not None:
+                source.on_complete()
+        except Exception as e:
+            ok, message = False, str(e)
+        self._done(idx, ok, message)
+        return ok
+
+    def _done(self, idx: int, ok: bool, message: str):
+        if not ok and self.is_stopped():
+            # ffmpeg terminado por stop(): no es un error de la conversión
+            message = CANCELLED_MESSAGE
+        if self.journal is not None:
+            self.journal.finished(idx, ok, message)
+        if idx in self.timings:
+            self._finish_timing(idx, ok)
+        self.on_file_done(idx, ok, message)
+
+    def _start_timing(self, idx: int) -> dict:
+        """Abre el registro de tiempos de una tarea al salir de la cola"""
+        now = time.monotonic()
+        timing = {"queue_wait_s": round(now - self._queued_at.get(idx, now), 3)}
+        self.timings[idx] = timing
+        return timing
+
+    def _finish_timing(self, idx: int, ok: bool):
+        """Completa el registro con el resultado y lo escribe en la traza"""
+        task = self.tasks[idx]
+        timing = self.timings[idx]
+        timing.update(index=idx, input=task["input"], output=task["output"], codec=task["codec"], ok=ok)
+        if ok:
+            try:
+                timing["output_bytes"] = os.path.getsize(task["output"])
+            except OSError:
+                pass
+            # Ya está en caché: el análisis se hizo antes de convertir
+            duration = duration_seconds(self.ffprobe_path, task["input"])
+            timing["duration_s"] = round(duration, 3)
+            if duration > 0 and timing.get("encode_s"):
+                timing["realtime_factor"] = round(duration / timing["encode_s"], 2)
+        if self.trace is not None:
+            self.trace.write(timing)
+
+    def _timed_probe(self, in_f: str) -> float:
+        """
+        Analiza la entrada (normalmente ya precargada) y devuelve cuánto tuvo
+        que esperar la tarea: casi cero si el análisis se adelantó en paralelo.
+        """
+        started = time.monotonic()
+        qp._metadata_cache.get_or_probe(self.ffprobe_path, in_f)
+        return round(time.monotonic() - started, 3)
+
+    def _convert(self, idx: int, task: dict) -> Tuple[bool, str]:
+        """
+        ffmpeg escribe en un nombre temporal que se renombra al terminar:
+        una salida con el nombre final está siempre completa.
+        """
+        out_f = task["output"]
+        tmp_f = partial_path(out_f)
+        ok, message = self._encode(idx, task, tmp_f)
+        ok, message = self._finish_output(ok, message, tmp_f, out_f)
+        return ok, message
+
+    @staticmethod
+    def _finish_output(ok: bool, message: str, tmp_f: str, out_f: str) -> Tuple[bool, str]:
+        """Renombra la salida temporal si todo fue bien; si no, la borra"""
+        try:
+            if ok:
+                os.replace(tmp_f, out_f)
+            elif os.path.exists(tmp_f):
+                os.remove(tmp_f)
+        except OSError as e:
+            ok, message = False, f"No se pudo guardar {out_f}: {e}"
+        return ok, message
+
+    def _output_args(self, task: dict, in_f: str, out_f: str) -> Tuple[List[str], bool]:
+        """
+        Opciones de ffmpeg para una salida (todo lo que va entre la entrada y
+        la ruta de salida). Devuelve también si la salida es una copia sin recodificar.
+        """
+        codec = task["codec"]
+        params = task["params"]  # dict
+        smart_copy = task.get("smart_copy", True)
+
+        # Optional smart-copy: if container+codec already match and no resample requested, do stream copy
+        if smart_copy and qp.can_stream_copy(in_f, out_f, self.ffprobe_path, codec, params):
+            args = ["-map", "0:a:0", "-c:a", "copy"]
+            if params.get("copy_meta", True):
+                args += ["-map_metadata", "0", "-map_chapters", "0", "-map", "0:v:0?"]
+                if codec == "mp3":
+                    args += ["-c:v", "mjpeg", "-id3v2_version", "3", "-write_id3v1", "1", "-disposition:v", "attached_pic"]
+                else:
+                    args += ["-c:v", "copy", "-disposition:v", "attached_pic"]
+            return args, True
+
+        # Build filterchain and codec options
+        codec_args, container_ext = qp.build_codec_args(codec, params, ffprobe=self.ffprobe_path, in_file=in_f)
+
+        # Base mapping
+        args = ["-map", "0:a:0"]
+
+        # Copiar metadatos
+        if params.get("copy_meta", True):
+            args += ["-map_metadata", "0", "-map_chapters", "0"]
+
+        # Portada sólo si el contenedor lo soporta
+        if params.get("copy_meta", True) and qp.supports_cover(codec):
+            args += ["-map", "0:v:0?"]
+            if codec == "mp3":
+                args += ["-c:v", "mjpeg", "-id3v2_version", "3", "-write_id3v1", "1", "-disposition:v", "attached_pic"]
+            else:
+                args += ["-c:v", "copy", "-disposition:v", "attached_pic"]
+
+        return args + codec_args, False
+
+    def _decoder_threads(self, in_f: str) -> List[str]:
+        """
+        -threads de la entrada: los decodificadores con hilos reparten los
+        núcleos que quedan libres (al final del lote, cuando corren pocos
+        trabajos); el resto decodifica en un solo hilo.
+        """
+        codec = probe_audio_meta(self.ffprobe_path, in_f).get("codec_name")
+        threads = self._slots.threads_per_job() if codec in qp.THREADED_DECODERS else 1
+        return ["-threads", str(threads)]
+
+    def _progress_flags(self) -> List[str]:
+        # -nostats: stderr solo se lee al final y no debe llenarse con estadísticas
+        return ["-nostats", "-stats_period", str(PROGRESS_PERIOD), "-progress", "pipe:1"]
+
+    def _encode(self, idx: int, task: dict, out_f: str) -> Tuple[bool, str]:
+        in_f = task["input"]
+        # Fuente remota: ffmpeg lee los bytes por stdin, sin archivo intermedio
+        source = task.get("source")
+        in_arg = "pipe:0" if source is not None else in_f
+        if source is not None and task.get("probe") is not None:
+            # No hay archivo que analizar: usar los metadatos del extractor
+            qp._metadata_cache.prime(in_f, task["probe"])
+        timing = self.timings.get(idx)
+        if timing is not None:
+            timing["probe_s"] = self._timed_probe(in_f)
+        if idx not in self.durations:
+            # Modo streaming o aún sin analizar al repartirla: se conoce al empezar la tarea
+            self.durations[idx] = duration_seconds(self.ffprobe_path, in_f)
+
+        # Ensure output folder exists
+        Path(out_f).parent.mkdir(parents=True, exist_ok=True)
+
+        cmd = [self.ffmpeg_path, "-y", "-hide_banner", "-nostdin"]
+        out_args, is_copy = self._output_args(task, in_f, out_f)
+        if is_copy:
+            # Run without progress since copy is instant
+            cmd += ["-i", in_arg] + out_args + [out_f]
+            ok, stderr = self._run_ffmpeg(cmd, source, timing=timing)
+            if timing is not None:
+                timing["copy"] = True
+            return ok, "copiado sin recodificar" if ok else stderr.strip()
+
+        # Prepare progress via -progress pipe:1
+        cmd += self._progress_flags() + self._decoder_threads(in_f) + ["-i", in_arg] + out_args + [out_f]
+        ok, stderr = self._run_ffmpeg(cmd, source, in_f, lambda pct: self.on_progress(idx, pct), timing)
+        return ok, "ok" if ok else stderr
+
+    def _run_group(self, members: List[Tuple[int, dict]]) -> bool:
+        """
+        Varios formatos de una misma entrada con un solo ffmpeg: la entrada se
+        lee y decodifica una vez y cada salida tiene su propio codificador.
+        Si el proceso falla, cada formato se repite por separado para saber
+        cuál falla y no perder los demás.
+        """
+        if self.is_stopped():
+            return False
+        if self.journal is not None:
+            for idx, _ in members:
+                self.journal.running(idx)
+        timings = [self._start_timing(idx) for idx, _ in members]
+        in_f = members[0][1]["input"]
+        cmd = [self.ffmpeg_path, "-y", "-hide_banner", "-nostdin"] + self._progress_flags()
+        outputs = []
+        # Tiempos del proceso compartido: se reparten tal cual a cada formato
+        shared = {"group_size": len(members)}
+        try:
+            shared["probe_s"] = self._timed_probe(in_f)
+            seconds = duration_seconds(self.ffprobe_path, in_f)
+            for idx, _ in members:
+                self.durations.setdefault(idx, seconds)
+            cmd += self._decoder_threads(in_f) + ["-i", in_f]
+            for idx, task in members:
+                tmp_f = partial_path(task["output"])
+                Path(tmp_f).parent.mkdir(parents=True, exist_ok=True)
+                out_args, is_copy = self._output_args(task, in_f, tmp_f)
+                cmd += out_args + [tmp_f]
+                outputs.append((idx, task, tmp_f, is_copy))
+
+            def report(pct: float):
+                for idx, _ in members:
+                    self.on_progress(idx, pct)
+
+            ok = self._run_ffmpeg(cmd, None, in_f, report, shared)[0]
+        except Exception:
+            ok = False
+        for timing in timings:
+            timing.update(shared)
+
+        if not ok:
+            for _, task, tmp_f, _ in outputs:
+                self._finish_output(False, "", tmp_f, task["output"])
+            if self.is_stopped():
+                return False
+            # Repetir cada salida por separado: el error queda asociado a su formato
+            results = [self._run_task(idx, task) for idx, task in members]
+            return all(results)
+
+        all_ok = True
+        for idx, task, tmp_f, is_copy in outputs:
+            if is_copy:
+                self.timings[idx]["copy"] = True
+            ok, message = self._finish_output(True, "copiado sin recodificar" if is_copy else "ok", tmp_f, task["output"])
+            if ok and self.manifest is not None:
+                self.manifest.record(task["output"], self._fingerprints.get(idx))
+            all_ok = all_ok and ok
+            self._done(idx, ok, message)
+        return all_ok
+
+    def _run_ffmpeg(self, cmd: List[str], source, in_f: Optional[str] = None,
+                    report: Optional[Callable[[float], None]] = None,
+                    timing: Optional[dict] = None) -> Tuple[bool, str]:
+        """
+        Ejecuta ffmpeg y devuelve (ok, stderr). Con report, lee el progreso de
+        -progress pipe:1 y lo informa en porcentaje sobre la duración de in_f.
+        Con timing, anota en él el tiempo del proceso, su CPU y la última
+        velocidad (speed=) que informó ffmpeg.
+        """
+        popen_kw = {"stdout": subprocess.PIPE, "stderr": subprocess.PIPE, "text": True}
+        if source is not None:
+            popen_kw["stdin"] = subprocess.PIPE
+
+        if report is None:
+            # Sin -progress, ffmpeg no escribe nada en stdout: basta con leer stderr
+            popen_kw["stdout"] = subprocess.DEVNULL
+            started = time.monotonic()
+            proc = self._spawn(cmd, **popen_kw)
+            feeder = self._start_feeder(proc, source)
+            try:
+                stderr = proc.stderr.read()
+                usage = self._wait(proc)
+            finally:
+                self._release(proc)
+            self._record_run(timing, started, usage)
+            ok = (proc.returncode == 0)
+            feed_error = self._join_feeder(feeder)
+            if ok and feed_error:
+                ok, stderr = False, feed_error
+            return ok, stderr
+
+        # Probe duration for progress
+        dur = duration_seconds(self.ffprobe_path, in_f)
+        dur = max(dur, 0.001)
+
+        started = time.monotonic()
+        speed = None
+        last_pct = None
+        proc = self._spawn(cmd, bufsize=1, **popen_kw)
+        feeder = self._start_feeder(proc, source)
+        try:
+            with proc:
+                for line in proc.stdout:
+                    if self.is_stopped():
+                        proc.terminate()
+                        try:
+                            proc.wait(timeout=2)
+                        except subprocess.TimeoutExpired:
+                            proc.kill()
+                            proc.wait()
+                        break
+                    line = line.strip()
+                    if line.startswith("out_time_ms"):
+                        try:
+                            micro = float(line.split("=")[1])
+                            secs = micro / 1_000_000.0
+                            # El 100 solo llega con progress=end, una vez
+                            pct = min(99.9, max(0, (secs / dur) * 100.0))
+                            if pct != last_pct:
+                                last_pct = pct
+                                report(pct)
+                        except:
+                            pass
+                    elif line.startswith("speed="):
+                        # Velocidad media desde el inicio ("12.3x"; "N/A" al principio)
+                        try:
+                            speed = float(line[6:].rstrip("x"))
+                        except ValueError:
+                            pass
+                    elif line == "progress=end":
+                        report(100.0)
+                usage = self._wait(proc)
+                self._record_run(timing, started, usage, speed)
+                ok = (proc.returncode == 0)
+                # On failure, capture stderr (limited to avoid memory issues)
+                stderr = ""
+                if proc.stderr:
+                    stderr_lines = proc.stderr.read().strip().split('\n')
+                    # Keep only last 20 lines to avoid memory issues with large outputs
+                    stderr = '\n'.join(stderr_lines[-20:])
+                feed_error = self._join_feeder(feeder)
+                if ok and feed_error:
+                    ok, stderr = False, feed_error
+                return ok, stderr
+        finally:
+            self._release(proc)
+
+    @staticmethod
+    def _wait(proc: subprocess.Popen):
+        """
+        Espera a que termine el proceso y devuelve su uso de recursos
+        (os.wait4, solo en POSIX); en Windows espera sin más y devuelve None.
+        """
+        if hasattr(os, "wait4") and proc.returncode is None:
+            try:
+                _, status, usage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                return usage
+            except ChildProcessError:
+                pass  # ya lo recogió otra espera (p. ej. al cancelar)
+        proc.wait()
+        return None
+
+    @staticmethod
+    def _record_run(timing: Optional[dict], started: float, usage, speed: Optional[float] = None):
+        if timing is None:
+            return
+        timing["encode_s"] = round(time.monotonic() - started, 3)
+        if usage is not None:
+            timing["cpu_user_s"] = round(usage.ru_utime, 3)
+            timing["cpu_sys_s"] = round(usage.ru_stime, 3)
+        if speed is not None:
+            timing["speed"] = speed
+
+    def _start_feeder(self, proc: subprocess.Popen, source) -> Optional[Tuple[Thread, list]]:
+        """Copia los bytes de la fuente remota al stdin de ffmpeg en otro hilo"""
+        if source is None:
+            return None
+        errors = []
+
+        def pump():
+            sink = proc.stdin.buffer
+            try:
+                with source.open() as resp:
+                    while not self.is_stopped():
+                        chunk = resp.read(STREAM_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        sink.write(chunk)
+            except BrokenPipeError:
+                pass  # ffmpeg terminó antes (error o cancelación): lo informa él
+            except Exception as e:
+                errors.append(f"Error leyendo {source.url}: {e}")
+            finally:
+                try:
+                    sink.close()
+                except OSError:
+                    pass
+
+        t = Thread(target=pump, name="stream-feed", daemon=True)
+        t.start()
+        return t, errors
+
+    @staticmethod
+    def _join_feeder(feeder) -> str:
+        if feeder is None:
+            return ""
+        thread, errors = feeder
+        thread.join()
+        return errors[0] if errors else ""
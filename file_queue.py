@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Cola de archivos a convertir como modelo de Qt.
+Sustituye al QListWidget de textos: las rutas viven en una lista de Python
+con un índice hash para detectar duplicados, y la vista solo pinta las filas
+visibles. Cada fila muestra además estado, progreso y tamaño.
+"""
+import os
+from typing import Iterable, List, Optional
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt
+from PySide6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionProgressBar
+
+# Estados de una fila
+STATUS_PENDING = "pending"
+STATUS_CONVERTING = "converting"
+STATUS_DONE = "done"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+
+STATUS_LABELS = {
+    STATUS_PENDING: "",
+    STATUS_CONVERTING: "Convirtiendo",
+    STATUS_DONE: "✓ Hecho",
+    STATUS_SKIPPED: "Omitido",
+    STATUS_ERROR: "✗ Error",
+}
+
+# Roles propios del modelo
+PathRole = Qt.UserRole + 1
+StatusRole = Qt.UserRole + 2
+ProgressRole = Qt.UserRole + 3
+SizeRole = Qt.UserRole + 4
+
+
+def format_size(size: Optional[int]) -> str:
+    """Tamaño legible (1.4 MB); cadena vacía si no se conoce"""
+    if size is None or size < 0:
+        return ""
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return ""
+
+
+class QueueEntry:
+    """Una fila de la cola; el tamaño se lee la primera vez que se pinta"""
+    __slots__ = ("path", "status", "progress", "size")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.status = STATUS_PENDING
+        self.progress = 0.0
+        self.size = None  # None = aún no leído, -1 = no disponible
+
+
+class FileQueueModel(QAbstractListModel):
+    """
+    Modelo de la cola de conversión. Añadir es O(1) por archivo gracias al
+    índice de rutas; las altas y bajas se notifican a la vista por lotes.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries: List[QueueEntry] = []
+        self._rows = {}  # ruta -> fila; se reconstruye tras quitar filas
+        self._rows_dirty = False
+
+    # --- Interfaz de QAbstractListModel ---
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._entries):
+            return None
+        entry = self._entries[index.row()]
+        if role in (Qt.DisplayRole, Qt.ToolTipRole, PathRole):
+            return entry.path
+        if role == StatusRole:
+            return entry.status
+        if role == ProgressRole:
+            return entry.progress
+        if role == SizeRole:
+            if entry.size is None:
+                # Solo se consulta el disco para las filas que llegan a pintarse
+                try:
+                    entry.size = os.path.getsize(entry.path)
+                except OSError:
+                    entry.size = -1
+            return entry.size
+        return None
+
+    # --- Altas y bajas ---
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._row_index()
+
+    def add_paths(self, paths: Iterable[str]) -> int:
+        """Añade las rutas que no estén ya en la cola; devuelve cuántas se añadieron"""
+        index = self._row_index()
+        new = []
+        for path in paths:
+            if path not in index:
+                index[path] = len(self._entries) + len(new)
+                new.append(QueueEntry(path))
+        if new:
+            first = len(self._entries)
+            self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+            self._entries.extend(new)
+            self.endInsertRows()
+        return len(new)
+
+    def remove_rows(self, rows: Iterable[int]):
+        """Quita filas (en cualquier orden), agrupando las consecutivas"""
+        for first, last in reversed(self._ranges(sorted(set(rows)))):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for entry in self._entries[first:last + 1]:
+                self._rows.pop(entry.path, None)
+            del self._entries[first:last + 1]
+            self.endRemoveRows()
+            self._rows_dirty = True
+
+    def remove_paths(self, paths: Iterable[str]):
+        index = self._row_index()
+        self.remove_rows(index[p] for p in paths if p in index)
+
+    def clear(self):
+        self.beginResetModel()
+        self._entries = []
+        self._rows = {}
+        self._rows_dirty = False
+        self.endResetModel()
+
+    def paths(self) -> List[str]:
+        return [entry.path for entry in self._entries]
+
+    # --- Estado y progreso ---
+
+    def set_status(self, path: str, status: str, progress: Optional[float] = None):
+        row = self._row_index().get(path)
+        if row is None:
+            return
+        entry = self._entries[row]
+        entry.status = status
+        if progress is not None:
+            entry.progress = progress
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [StatusRole, ProgressRole])
+
+    def reset_status(self):
+        """Vuelve a dejar todas las filas como pendientes"""
+        for entry in self._entries:
+            entry.status = STATUS_PENDING
+            entry.progress = 0.0
+        if self._entries:
+            self.dataChanged.emit(self.index(0), self.index(len(self._entries) - 1), [StatusRole, ProgressRole])
+
+    # --- Internos ---
+
+    def _row_index(self) -> dict:
+        if self._rows_dirty:
+            self._rows = {entry.path: row for row, entry in enumerate(self._entries)}
+            self._rows_dirty = False
+        return self._rows
+
+    @staticmethod
+    def _ranges(rows: List[int]) -> List[tuple]:
+        """[1, 2, 3, 7, 8] -> [(1, 3), (7, 8)]"""
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1] = (ranges[-1][0], row)
+            else:
+                ranges.append((row, row))
+        return ranges
+
+
+class FileQueueDelegate(QStyledItemDelegate):
+    """Pinta la ruta y, a la derecha, tamaño, estado y una barra de progreso"""
+    SIZE_WIDTH = 70
+    STATUS_WIDTH = 100
+    BAR_WIDTH = 90
+
+    def paint(self, painter, option, index):
+        status = index.data(StatusRole)
+        right = self.SIZE_WIDTH + self.STATUS_WIDTH
+        if status == STATUS_CONVERTING:
+            right += self.BAR_WIDTH
+
+        # Ruta con el ancho que queda libre (recortada con "…" por el estilo)
+        text_option = type(option)(option)
+        text_option.rect = option.rect.adjusted(0, 0, -right, 0)
+        super().paint(painter, text_option, index)
+
+        rect = option.rect
+        x = rect.right() - right
+        if status == STATUS_CONVERTING:
+            bar = QStyleOptionProgressBar()
+            bar.rect = QRect(x, rect.top() + 2, self.BAR_WIDTH - 6, rect.height() - 4)
+            bar.minimum, bar.maximum = 0, 100
+            bar.progress = int(index.data(ProgressRole) or 0)
+            bar.text = f"{bar.progress}%"
+            bar.textVisible = True
+            style = option.widget.style() if option.widget else QApplication.style()
+            style.drawControl(QStyle.CE_ProgressBar, bar, painter)
+            x += self.BAR_WIDTH
+
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.setPen(option.palette.highlightedText().color())
+        painter.drawText(QRect(x, rect.top(), self.STATUS_WIDTH, rect.height()),
+                         Qt.AlignVCenter | Qt.AlignLeft, STATUS_LABELS.get(status, ""))
+        painter.drawText(QRect(x + self.STATUS_WIDTH, rect.top(), self.SIZE_WIDTH - 4, rect.height()),
+                         Qt.AlignVCenter | Qt.AlignRight, format_size(index.data(SizeRole)))
+        painter.restore()
+
+    def sizeHint(self, option, index) -> QSize:
+        # Todas las filas miden lo mismo (la vista usa uniformItemSizes)
+        hint = super().sizeHint(option, index)
+        return QSize(hint.width() + self.SIZE_WIDTH + self.STATUS_WIDTH, max(hint.height(), 20))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Diario de trabajos para reanudar un lote interrumpido.
+Cada lote escribe un archivo JSON lines de solo anexar en el caché de la
+aplicación: una línea al encolar cada tarea, otra al empezarla y otra al
+terminarla. Si la aplicación se cierra a mitad, el último diario indica
+qué tareas quedaron sin terminar.
+"""
+import os
+import json
+import time
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional
+
+import quality_presets as qp
+
+JOURNAL_DIR = qp.CACHE_DIR / "journal"
+
+# Campos de la tarea que se guardan (los necesarios para volver a ejecutarla)
+TASK_FIELDS = ("input", "output", "codec", "params", "smart_copy", "group")
+
+
+class JobJournal:
+    """
+    Diario de un lote. Seguro para llamarlo desde varios hilos; cada línea
+    se vuelca al sistema operativo al escribirla, así que sobrevive a un
+    cierre forzado de la aplicación.
+    """
+    KEEP_BATCHES = 10  # diarios antiguos que se conservan
+
+    def __init__(self, journal_dir: Path = JOURNAL_DIR):
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._file = self._create(journal_dir)
+        self._write({"event": "batch", "time": time.time()})
+        self._prune(journal_dir)
+
+    def _create(self, journal_dir: Path):
+        """
+        Crea el diario con un nombre nuevo: fecha con nanosegundos (el orden
+        alfabético es el cronológico) y PID. Con "x" dos lotes nunca comparten
+        archivo, aunque empiecen a la vez.
+        """
+        while True:
+            now = time.time_ns()
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now // 1_000_000_000))
+            self.path = journal_dir / f"{stamp}-{now % 1_000_000_000:09d}-{os.getpid()}.jsonl"
+            try:
+                return open(self.path, "x", encoding="utf-8")
+            except FileExistsError:
+                continue
+
+    def _write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def queued(self, idx: int, task: dict):
+        # Las fuentes remotas (conversión al vuelo) no se pueden repetir desde el diario
+        if "source" in task:
+            return
+        self._write({"event": "queued", "index": idx,
+                     "task": {k: task[k] for k in TASK_FIELDS if k in task}})
+
+    def running(self, idx: int):
+        self._write({"event": "running", "index": idx})
+
+    def finished(self, idx: int, ok: bool, message: str = ""):
+        self._write({"event": "finished", "index": idx, "ok": ok, "message": message[:200]})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _prune(self, journal_dir: Path):
+        old = sorted(journal_dir.glob("*.jsonl"))[:-self.KEEP_BATCHES]
+        for path in old:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    # --- Lectura ---
+
+    @staticmethod
+    def latest(journal_dir: Path = JOURNAL_DIR) -> Optional[Path]:
+        """Diario del lote más reciente, o None si no hay ninguno"""
+        journals = sorted(journal_dir.glob("*.jsonl")) if journal_dir.is_dir() else []
+        return journals[-1] if journals else None
+
+    @staticmethod
+    def unfinished_tasks(path: Path) -> List[dict]:
+        """Tareas del diario que no llegaron a terminar bien, en su orden original"""
+        tasks = {}
+        done = set()
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # última línea a medio escribir
+                    event = record.get("event")
+                    if event == "queued":
+                        tasks[record["index"]] = record["task"]
+                    elif event == "finished" and record.get("ok"):
+                        done.add(record["index"])
+        except OSError:
+            return []
+        return [task for idx, task in sorted(tasks.items()) if idx not in done]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Manifiesto de conversiones para el modo incremental.
+Cada salida guarda una huella de lo que la produjo (entrada, formato,
+parámetros y versión de ffmpeg). Si en una ejecución posterior la huella
+coincide y la salida sigue intacta, el archivo se omite.
+"""
+import os
+import json
+import hashlib
+import sqlite3
+import subprocess
+from pathlib import Path
+from threading import Lock
+from functools import lru_cache
+from typing import Optional
+
+
+@lru_cache(maxsize=None)
+def ffmpeg_version(ffmpeg_path: str) -> str:
+    """Primera línea de `ffmpeg -version` (una sola llamada por ejecutable)"""
+    try:
+        p = subprocess.run([ffmpeg_path, "-version"], capture_output=True, text=True, timeout=10)
+        lines = p.stdout.splitlines()
+        return lines[0].strip() if lines else ""
+    except Exception:
+        return ""
+
+
+def task_fingerprint(task: dict, ffmpeg_ver: str) -> Optional[str]:
+    """
+    Huella de una tarea: entrada (ruta, tamaño, mtime), formato destino,
+    parámetros y versión de ffmpeg. None si no se puede leer la entrada.
+    """
+    try:
+        st = os.stat(task["input"])
+    except OSError:
+        return None
+    payload = {
+        "input": task["input"],
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "codec": task["codec"],
+        "params": task["params"],
+        "smart_copy": task.get("smart_copy", True),
+        "ffmpeg": ffmpeg_ver,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class JobManifest:
+    """
+    Manifiesto SQLite guardado en la carpeta de salida.
+    Se comparte entre los hilos de conversión.
+    """
+    FILENAME = ".audio_converter_manifest.sqlite3"
+
+    def __init__(self, out_root: str):
+        self.db_path = Path(out_root) / self.FILENAME
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            " output TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def is_up_to_date(self, output: str, fingerprint: Optional[str]) -> bool:
+        """True si la salida existe, no ha cambiado y se produjo con la misma huella"""
+        if fingerprint is None:
+            return False
+        try:
+            st = os.stat(output)
+        except OSError:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, size, mtime_ns FROM outputs WHERE output=?", (output,)
+            ).fetchone()
+        return row is not None and row == (fingerprint, st.st_size, st.st_mtime_ns)
+
+    def record(self, output: str, fingerprint: Optional[str]):
+        """Registra una salida recién producida"""
+        if fingerprint is None:
+            return
+        try:
+            st = os.stat(output)
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs (output, fingerprint, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                (output, fingerprint, st.st_size, st.st_mtime_ns)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,37 +1,153 @@
 # -*- coding: utf-8 -*-
+import time
+_IMPORT_T0 = time.perf_counter()
+
 import os
 import sys
-import shutil
-import json
 import subprocess
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import urllib.request
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 import tempfile
-from threading import Lock
+from threading import Lock, Semaphore
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QFileDialog, QListWidget, QVBoxLayout, QHBoxLayout,
+    QApplication, QMainWindow, QWidget, QFileDialog, QListView, QAbstractItemView, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QComboBox, QSpinBox, QCheckBox, QProgressBar, QLineEdit, QMessageBox,
-    QGroupBox, QFormLayout, QTextEdit
+    QGroupBox, QFormLayout, QTextEdit, QToolButton, QMenu
 )
 
 import quality_presets as qp
+from file_queue import (
+    FileQueueDelegate, FileQueueModel, STATUS_CONVERTING, STATUS_DONE, STATUS_ERROR, STATUS_PENDING, STATUS_SKIPPED
+)
+from job_journal import JobJournal
+from job_manifest import JobManifest
+from task_trace import TaskTrace, format_summary, summarize
+from convert_engine import (
+    AUDIO_EXTENSIONS, CANCELLED_MESSAGE, DUPLICATE_MESSAGE, SKIPPED_MESSAGE, STREAMABLE_EXTS, BatchProgress,
+    ConvertEngine, HttpStreamSource, ProgressAggregator, build_fanout_tasks, build_stream_task, build_tasks,
+    default_job_count, find_ffmpeg, find_ffprobe, iter_audio_files, parse_extensions, remove_stale_partials
+)
 
-try:
-    import yt_dlp
-    YT_DLP_AVAILABLE = True
-except ImportError:
-    YT_DLP_AVAILABLE = False
+# yt-dlp es pesado: solo se comprueba que está instalado y se importa al descargar
+YT_DLP_AVAILABLE = importlib.util.find_spec("yt_dlp") is not None
+yt_dlp = None
 
 # ---------------------------
 # Utilities
 # ---------------------------
 
+def load_yt_dlp():
+    """Importa yt-dlp la primera vez que se necesita"""
+    global yt_dlp
+    if yt_dlp is None:
+        import yt_dlp as _yt_dlp
+        yt_dlp = _yt_dlp
+    return yt_dlp
+
+
+def ytdlp_version() -> str:
+    """Versión instalada de yt-dlp, sin importar el paquete si es posible"""
+    try:
+        importlib.invalidate_caches()
+        return importlib.metadata.version("yt-dlp")
+    except Exception:
+        # Ejecutable sin metadatos del paquete: leer la versión del propio módulo
+        return load_yt_dlp().version.__version__
+
+
+class StartupProfiler:
+    """Mide el tiempo de cada fase del arranque (--profile-startup)"""
+
+    def __init__(self, enabled: bool, t0: float):
+        self.enabled = enabled
+        self._t0 = t0
+        self._last = t0
+
+    def mark(self, phase: str):
+        """Cierra una fase del hilo principal: tiempo desde la marca anterior"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._print(phase, now - self._last, now)
+        self._last = now
+
+    def note(self, phase: str, seconds: float):
+        """Registra una fase que se ejecutó en segundo plano"""
+        if self.enabled:
+            self._print(f"{phase} (segundo plano)", seconds, time.perf_counter())
+
+    def _print(self, phase: str, seconds: float, now: float):
+        print(f"[startup] {phase}: {seconds * 1000:.1f} ms (total {(now - self._t0) * 1000:.1f} ms)",
+              file=sys.stderr, flush=True)
+
+
+# Caché del resultado de la comprobación de actualizaciones de yt-dlp
+YTDLP_CHECK_FILE = qp.CACHE_DIR / "ytdlp_update_check.json"
+YTDLP_CHECK_TTL = timedelta(days=1)
+YTDLP_CHECK_ERROR_TTL = timedelta(hours=1)  # sin red: reintentar antes
+
+# Registro de vídeos ya descargados (extractor + id), compartido entre ejecuciones
+YTDLP_ARCHIVE_FILE = qp.CACHE_DIR / "ytdlp_archive.txt"
+
+# Entradas que se piden de cada vez al recorrer listas paginadas
+PLAYLIST_PAGE_SIZE = 50
+YTDLP_PYPI_URL = "https://pypi.org/pypi/yt-dlp/json"
+
+
+def _version_key(version: str) -> tuple:
+    """'2024.08.06' -> (2024, 8, 6) para comparar versiones de yt-dlp"""
+    parts = []
+    for p in version.split("."):
+        digits = "".join(ch for ch in p if ch.isdigit())
+        parts.append(int(digits) if digits else 0)
+    return tuple(parts)
+
+
+def _load_update_check(current_version: str) -> Optional[dict]:
+    """Resultado cacheado si sigue vigente y corresponde a la versión instalada"""
+    try:
+        data = json.loads(YTDLP_CHECK_FILE.read_text(encoding="utf-8"))
+        checked_at = datetime.fromisoformat(data["checked_at"])
+    except Exception:
+        return None
+    if data.get("current") != current_version:
+        return None
+    ttl = YTDLP_CHECK_ERROR_TTL if data.get("error") else YTDLP_CHECK_TTL
+    if datetime.now() - checked_at >= ttl:
+        return None
+    return data
+
+
+def _save_update_check(current_version: str, latest: Optional[str], needs_update: bool, error: str = ""):
+    try:
+        YTDLP_CHECK_FILE.parent.mkdir(parents=True, exist_ok=True)
+        YTDLP_CHECK_FILE.write_text(json.dumps({
+            "checked_at": datetime.now().isoformat(),
+            "current": current_version,
+            "latest": latest,
+            "needs_update": needs_update,
+            "error": error,
+        }), encoding="utf-8")
+    except OSError:
+        pass
+
+
 def check_ytdlp_update() -> tuple[bool, str, str]:
     """
     Verifica si hay una actualización de yt-dlp disponible.
+    Consulta solo los metadatos de yt-dlp en PyPI y guarda el resultado
+    (también los negativos y los errores) en la caché con un TTL.
+    Puede tardar por la red: llamarla fuera del hilo de la interfaz.
     Returns: (needs_update, current_version, message)
     """
     if not YT_DLP_AVAILABLE:
@@ -42,46 +158,37 @@ def check_ytdlp_update() -> tuple[bool, str, str]:
     if getattr(sys, 'frozen', False):
         # Estamos en ejecutable compilado por PyInstaller
         try:
-            current_version = yt_dlp.version.__version__
+            current_version = ytdlp_version()
             return False, current_version, f"Auto-actualización deshabilitada en ejecutable (versión actual: {current_version})"
         except:
             return False, "unknown", "Auto-actualización deshabilitada en ejecutable"
     
     try:
         # Obtener versión instalada
-        current_version = yt_dlp.version.__version__
-        
-        # Verificar última actualización (archivo de timestamp)
-        cache_dir = Path.home() / ".audio_converter_cache"
-        cache_dir.mkdir(exist_ok=True)
-        update_file = cache_dir / "ytdlp_last_update.txt"
-        
-        # Verificar si ya se actualizó hoy
-        if update_file.exists():
-            try:
-                last_update = datetime.fromisoformat(update_file.read_text().strip())
-                if datetime.now() - last_update < timedelta(days=1):
-                    return False, current_version, f"yt-dlp {current_version} (actualizado hoy)"
-            except:
-                pass
-        
-        # Verificar si hay actualización disponible (sin instalar)
-        # NOTA: Solo funciona en entorno Python normal, no en ejecutable
-        result = subprocess.run(
-            [sys.executable, "-m", "pip", "list", "--outdated"],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        if "yt-dlp" in result.stdout.lower():
-            return True, current_version, f"Actualización disponible para yt-dlp {current_version}"
-        
-        return False, current_version, f"yt-dlp {current_version} está actualizado"
-        
+        current_version = ytdlp_version()
     except Exception as e:
         return False, "unknown", f"Error verificando actualización: {str(e)}"
 
+    cached = _load_update_check(current_version)
+    if cached is not None:
+        if cached.get("needs_update"):
+            return True, current_version, f"Actualización disponible para yt-dlp {current_version} → {cached.get('latest')}"
+        return False, current_version, f"yt-dlp {current_version} (comprobado recientemente)"
+
+    try:
+        req = urllib.request.Request(YTDLP_PYPI_URL, headers={"Accept": "application/json"})
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            latest = json.load(resp)["info"]["version"]
+    except Exception as e:
+        _save_update_check(current_version, None, False, error=str(e))
+        return False, current_version, f"Error verificando actualización: {str(e)}"
+
+    needs_update = _version_key(latest) > _version_key(current_version)
+    _save_update_check(current_version, latest, needs_update)
+    if needs_update:
+        return True, current_version, f"Actualización disponible para yt-dlp {current_version} → {latest}"
+    return False, current_version, f"yt-dlp {current_version} está actualizado"
+
 
 def update_ytdlp_silent() -> tuple[bool, str]:
     """
@@ -101,17 +208,10 @@ def update_ytdlp_silent() -> tuple[bool, str]:
         )
         
         if result.returncode == 0:
-            # Guardar timestamp de actualización
-            cache_dir = Path.home() / ".audio_converter_cache"
-            cache_dir.mkdir(exist_ok=True)
-            update_file = cache_dir / "ytdlp_last_update.txt"
-            update_file.write_text(datetime.now().isoformat())
-            
-            # Obtener nueva versión
+            # Obtener nueva versión y recordar que ya está al día
             try:
-                import importlib
-                importlib.reload(yt_dlp.version)
-                new_version = yt_dlp.version.__version__
+                new_version = ytdlp_version()
+                _save_update_check(new_version, new_version, False)
                 return True, f"yt-dlp actualizado a {new_version}"
             except:
                 return True, "yt-dlp actualizado exitosamente"
@@ -124,150 +224,46 @@ def update_ytdlp_silent() -> tuple[bool, str]:
         return False, f"Error: {str(e)}"
 
 
-def find_ffmpeg() -> Optional[str]:
-    """
-    Return path to ffmpeg executable.
-    Priority: local ./bin/ffmpeg(.exe) then PATH.
-    """
-    # 1. Local bin dentro del ejecutable (PyInstaller _MEIPASS)
-    local_bin = Path(getattr(sys, "_MEIPASS", Path.cwd())) / "bin"
-    for candidate in ["ffmpeg.exe", "ffmpeg"]:
-        p = local_bin / candidate
-        if p.exists():
-            print(f"✓ FFmpeg encontrado en _MEIPASS: {p}")
-            return str(p)
-    
-    # 2. Carpeta bin junto al ejecutable (para distribución)
-    if getattr(sys, 'frozen', False):
-        # Estamos en ejecutable, buscar en carpeta del .exe
-        exe_dir = Path(sys.executable).parent / "bin"
-        for candidate in ["ffmpeg.exe", "ffmpeg"]:
-            p = exe_dir / candidate
-            if p.exists():
-                print(f"✓ FFmpeg encontrado junto al ejecutable: {p}")
-                return str(p)
-    
-    # 3. PATH del sistema
-    exe = shutil.which("ffmpeg")
-    if exe:
-        print(f"✓ FFmpeg encontrado en PATH: {exe}")
-        return exe
-
-    # 4. Windows PATH try common installs
-    if os.name == "nt":
-        common = [
-            r"C:\ffmpeg\bin\ffmpeg.exe",
-            r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-            r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe",
-        ]
-        for c in common:
-            if os.path.exists(c):
-                print(f"✓ FFmpeg encontrado en ubicación común: {c}")
-                return c
-    
-    print("❌ FFmpeg NO encontrado en ninguna ubicación")
-    return None
-
-
-def find_ffprobe() -> Optional[str]:
-    """
-    Return path to ffprobe executable.
-    Mirror logic of find_ffmpeg.
-    """
-    # 1. Local bin dentro del ejecutable (PyInstaller _MEIPASS)
-    local_bin = Path(getattr(sys, "_MEIPASS", Path.cwd())) / "bin"
-    for candidate in ["ffprobe.exe", "ffprobe"]:
-        p = local_bin / candidate
-        if p.exists():
-            print(f"✓ FFprobe encontrado en _MEIPASS: {p}")
-            return str(p)
-    
-    # 2. Carpeta bin junto al ejecutable (para distribución)
-    if getattr(sys, 'frozen', False):
-        exe_dir = Path(sys.executable).parent / "bin"
-        for candidate in ["ffprobe.exe", "ffprobe"]:
-            p = exe_dir / candidate
-            if p.exists():
-                print(f"✓ FFprobe encontrado junto al ejecutable: {p}")
-                return str(p)
-    
-    # 3. PATH del sistema
-    exe = shutil.which("ffprobe")
-    if exe:
-        print(f"✓ FFprobe encontrado en PATH: {exe}")
-        return exe
-
-    # 4. Windows common locations
-    if os.name == "nt":
-        common = [
-            r"C:\ffmpeg\bin\ffprobe.exe",
-            r"C:\Program Files\ffmpeg\bin\ffprobe.exe",
-            r"C:\Program Files (x86)\ffmpeg\bin\ffprobe.exe",
-        ]
-        for c in common:
-            if os.path.exists(c):
-                print(f"✓ FFprobe encontrado en ubicación común: {c}")
-                return c
-    
-    print("❌ FFprobe NO encontrado en ninguna ubicación")
-    return None
-
-
-def probe_audio_meta(ffprobe_path: str, fpath: str) -> dict:
-    """
-    Return metadata for the first audio stream via ffprobe json.
-    """
-    cmd = [
-        ffprobe_path, "-v", "error", "-select_streams", "a:0",
-        "-show_entries", "stream=codec_name,codec_type,channels,sample_rate,sample_fmt,bit_rate,duration",
-        "-of", "json", fpath
-    ]
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    if p.returncode != 0:
-        return {}
-    try:
-        data = json.loads(p.stdout)
-        if "streams" in data and data["streams"]:
-            return data["streams"][0]
-        return {}
-    except json.JSONDecodeError:
-        return {}
-
-
-def duration_seconds(ffprobe_path: str, fpath: str) -> float:
-    """
-    Fetch format duration for progress computation.
-    """
-    cmd = [
-        ffprobe_path, "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        fpath,
-    ]
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    if p.returncode == 0:
-        try:
-            return float(p.stdout.strip())
-        except:
-            return 0.0
-    return 0.0
-
-
 # ---------------------------
 # Download Worker Thread
 # ---------------------------
 
 class DownloadWorker(QThread):
     progress = Signal(str)  # status message
-    progress_percent = Signal(int, float)  # index, percent
+    progress_percent = Signal(int, float)  # entry index, percent
+    entries_total = Signal(int)  # total estimado de entradas al expandir listas
     finished = Signal(bool, str, list)  # success, message, list of downloaded files
+
+    # Descargas simultáneas por defecto y límite por servidor (evita errores 429)
+    DEFAULT_PARALLEL = 4
+    DEFAULT_PER_HOST = 2
     
-    def __init__(self, urls: List[str], output_dir: str):
+    def __init__(self, urls: List[str], output_dir: str, ffmpeg_path: Optional[str] = None,
+                 max_parallel: int = DEFAULT_PARALLEL, per_host_limit: int = DEFAULT_PER_HOST,
+                 on_file_ready: Optional[Callable[[str], None]] = None,
+                 on_stream_ready: Optional[Callable[[str, HttpStreamSource, qp.ProbeRecord], None]] = None,
+                 extract_audio: bool = True):
         super().__init__()
         self.urls = urls
         self.output_dir = output_dir
+        self.ffmpeg_path = ffmpeg_path
+        # False cuando una conversión sigue a la descarga: evita pasar dos veces por ffmpeg
+        self.extract_audio = extract_audio
+        # Se llama (desde el hilo de descarga) con cada archivo terminado
+        self.on_file_ready = on_file_ready
+        # Si se indica, el audio accesible por HTTP no se descarga: se entrega
+        # su URL para que ffmpeg lo convierta al vuelo (nombre, fuente, metadatos)
+        self.on_stream_ready = on_stream_ready
+        self.streamed_count = 0
+        self._entry_count = 0  # entradas (vídeos) encontradas en todas las URLs
+        self._url_totals = {i: 1 for i in range(len(urls))}  # entradas por URL (estimadas)
+        self.skipped_count = 0  # entradas que ya figuraban en el archivo de descargas
+        self.max_parallel = max(1, max_parallel)
+        self.per_host_limit = max(1, per_host_limit)
         self._stop = False
         self._stop_lock = Lock()
+        self._host_slots = {}
+        self._host_lock = Lock()
     
     def stop(self):
         with self._stop_lock:
@@ -276,46 +272,355 @@ class DownloadWorker(QThread):
     def is_stopped(self) -> bool:
         with self._stop_lock:
             return self._stop
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        """Servidor de una URL ("www.youtube.com" y "youtube.com" cuentan como el mismo)"""
+        host = (urlparse(url).hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        return host
+
+    def _host_slot(self, url: str) -> Semaphore:
+        """Semáforo que limita las descargas simultáneas contra un mismo servidor"""
+        host = self._host_key(url)
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = Semaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def _interleave_by_host(self) -> List[Tuple[int, str]]:
+        """
+        Reparte las URLs alternando servidores para que las que esperan turno
+        en un servidor saturado no bloqueen a las de otros servidores.
+        """
+        by_host = {}
+        for idx, url in enumerate(self.urls):
+            by_host.setdefault(self._host_key(url), []).append((idx, url))
+        queues = list(by_host.values())
+        ordered = []
+        while queues:
+            for q in list(queues):
+                ordered.append(q.pop(0))
+                if not q:
+                    queues.remove(q)
+        return ordered
     
     def run(self):
         if not YT_DLP_AVAILABLE:
             self.finished.emit(False, "yt-dlp no está instalado. Ejecuta: pip install yt-dlp", [])
             return
-        
-        downloaded_files = []
+
+        # Importación diferida (fuera del hilo de la interfaz)
+        load_yt_dlp()
         
         # Create output directory
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+
+        # Debug: Verificar si estamos en ejecutable
+        if getattr(sys, 'frozen', False):
+            self.progress.emit(f"🔍 Modo: Ejecutable compilado (PyInstaller)")
+        else:
+            self.progress.emit(f"🔍 Modo: Python directo")
+
+        # Find FFmpeg for yt-dlp (una sola vez para todas las URLs)
+        if not self.ffmpeg_path:
+            self.ffmpeg_path = find_ffmpeg()
+        if not self.ffmpeg_path:
+            error_msg = ("❌ ERROR CRÍTICO: FFmpeg no encontrado\n\n"
+                        "FFmpeg es necesario para procesar el audio descargado.\n\n"
+                        "SOLUCIONES:\n"
+                        "1. Instala FFmpeg: https://ffmpeg.org/download.html\n"
+                        "2. Añade FFmpeg a la variable PATH del sistema\n"
+                        "3. O coloca ffmpeg.exe en la carpeta 'bin' junto al ejecutable")
+            self.progress.emit(error_msg)
+            self.finished.emit(False, error_msg, [])
+            return  # ← Detener completamente, no continuar
+
+        # Resultados por índice para conservar el orden de las URLs
+        results = {}
+        workers = min(self.max_parallel, max(1, len(self.urls)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yt-dlp") as pool:
+            futures = {pool.submit(self._download_url, idx, url): idx for idx, url in self._interleave_by_host()}
+            for fut, idx in futures.items():
+                results[idx] = fut.result()
+
+        downloaded_files = []
+        for idx in sorted(results):
+            downloaded_files.extend(results[idx])
         
-        for idx, url in enumerate(self.urls):
-            if self.is_stopped():
-                break
+        if downloaded_files or self.streamed_count or self.skipped_count:
+            message = f"Descargados {len(downloaded_files)} archivo(s)"
+            if self.streamed_count:
+                message += f", {self.streamed_count} convertido(s) al vuelo"
+            if self.skipped_count:
+                message += f", {self.skipped_count} omitido(s) por estar ya descargados"
+            self.finished.emit(True, message, downloaded_files)
+        else:
+            # Mensaje más descriptivo si no se descargó nada
+            if any("403" in str(e) for e in []):  # Simplificado
+                error_detail = ("No se descargó ningún archivo.\n\n"
+                               "Si obtuviste errores 403 de YouTube:\n"
+                               "1. Actualiza yt-dlp: pip install -U yt-dlp\n"
+                               "2. Reinicia la aplicación\n"
+                               "3. Intenta de nuevo")
+            else:
+                error_detail = "No se descargó ningún archivo. Revisa los errores arriba."
             
+            self.finished.emit(False, error_detail, [])
+
+    def _ydl_opts(self, progress_hook) -> dict:
+        """Opciones de yt-dlp para la mejor calidad de audio"""
+        # Configuración mejorada para evitar error 403 de YouTube
+        return {
+            'format': 'bestaudio/best',
+            'outtmpl': str(Path(self.output_dir) / '%(title)s.%(ext)s'),
+            'quiet': False,
+            'no_warnings': False,
+            'extract_flat': False,
+            'progress_hooks': [progress_hook],
+            'ffmpeg_location': str(Path(self.ffmpeg_path).parent),
+            # Si después se convierte, se guarda el stream tal cual: una sola codificación
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'best',
+                'preferredquality': '0',
+            }] if self.extract_audio else [],
+            'prefer_ffmpeg': True,
+            'keepvideo': False,
+            # Omitir lo ya descargado y continuar los .part de una ejecución interrumpida
+            'download_archive': str(YTDLP_ARCHIVE_FILE),
+            'continuedl': True,
+            'nopart': False,
+            'writethumbnail': False,
+            'no_post_overwrites': False,
+            
+            # Soluciones para error 403 de YouTube
+            'extractor_args': {
+                'youtube': {
+                    'player_client': ['android', 'web'],
+                    'player_skip': ['webpage', 'configs'],
+                }
+            },
+            
+            # Headers para simular navegador real
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+                'Accept-Encoding': 'gzip, deflate',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1'
+            },
+            
+            # Opciones adicionales para estabilidad
+            'socket_timeout': 30,
+            'retries': 3,
+            'fragment_retries': 3,
+            'skip_unavailable_fragments': True,
+            'ignoreerrors': False,
+            'nocheckcertificate': False,
+        }
+
+    def _file_ready(self, path: str, downloaded_files: List[str]):
+        downloaded_files.append(path)
+        self.progress.emit(f"Descargado: {os.path.basename(path)}")
+        if self.on_file_ready is not None:
+            # Puede bloquear si la cola de conversión está llena
+            self.on_file_ready(path)
+
+    @staticmethod
+    def _is_streamable(entry: dict) -> bool:
+        """
+        True si el formato elegido es un único archivo HTTP en un contenedor que
+        ffmpeg puede leer de una tubería (MP4/M4A necesitan poder buscar en el archivo).
+        """
+        if entry.get('requested_formats') or not entry.get('url'):
+            return False
+        if entry.get('protocol') not in ('http', 'https'):
+            return False
+        return entry.get('ext') in STREAMABLE_EXTS
+
+    @staticmethod
+    def _output_paths(entry: dict) -> List[str]:
+        """Rutas finales (tras el postprocesado) que yt-dlp registró para una entrada"""
+        downloads = entry.get('requested_downloads') or [entry]
+        paths = [d.get('filepath') for d in downloads]
+        return [p for p in paths if p and os.path.exists(p)]
+
+    def _skip(self, label: str):
+        with self._host_lock:
+            self.skipped_count += 1
+        self.progress.emit(f"Ya descargado: {label}")
+
+    def _stream_ready(self, ydl, entry: dict):
+        name = Path(ydl.prepare_filename(entry)).stem
+        # Se anota en el archivo de descargas solo si la conversión termina bien
+        source = HttpStreamSource(entry['url'], entry.get('http_headers'),
+                                  on_complete=lambda: ydl.record_download_archive(entry))
+        with self._host_lock:
+            self.streamed_count += 1
+        self.progress.emit(f"Convirtiendo al vuelo: {name}")
+        self.on_stream_ready(name, source, qp.ProbeRecord.from_ytdlp(entry))
+
+    def _new_entry(self) -> int:
+        """Índice global de una entrada (vídeo) para progress_percent"""
+        with self._host_lock:
+            self._entry_count += 1
+            return self._entry_count - 1
+
+    def _set_url_total(self, url_idx: int, total: int):
+        """Actualiza el número de entradas de una URL y emite el total estimado"""
+        with self._host_lock:
+            self._url_totals[url_idx] = max(1, total)
+            estimate = sum(self._url_totals.values())
+        self.entries_total.emit(estimate)
+
+    @staticmethod
+    def _lazy_entries(entries) -> Iterator[dict]:
+        """Recorre las entradas de una lista sin resolverlas todas a la vez"""
+        if isinstance(entries, yt_dlp.utils.PagedList):
+            start = 0
+            while True:
+                page = entries.getslice(start, start + PLAYLIST_PAGE_SIZE)
+                if not page:
+                    return
+                yield from page
+                start += len(page)
+        yield from entries or []
+
+    @staticmethod
+    def _follow_redirects(ydl, info: Optional[dict]) -> Optional[dict]:
+        """
+        Sigue las entradas url/url_transparent (enlaces de una lista, redirecciones
+        regionales...) hasta la página real, sin procesarla (process=False).
+        Devuelve None si el destino ya figura en el archivo de descargas.
+        """
+        while info is not None and info.get('_type') in ('url', 'url_transparent'):
+            target = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+            if target is not None and info['_type'] == 'url_transparent':
+                # Como yt-dlp: los datos de la página que enlaza prevalecen sobre los del destino
+                exempt = {'_type', 'url', 'ie_key'}
+                if not info.get('section_end') and info.get('section_start') is None:
+                    exempt |= {'id', 'extractor', 'extractor_key'}
+                target = dict(target)
+                target.update((k, v) for k, v in info.items() if v is not None and k not in exempt)
+                if target.get('_type') == 'url':
+                    target['_type'] = 'url_transparent'
+            info = target
+        return info
+
+    def _iter_entries(self, ydl, url_idx: int, url: str) -> Iterator[Tuple[int, Optional[int], dict]]:
+        """
+        Expande la URL sin procesar (extract_info con process=False): las listas
+        se recorren a medida que se consumen en vez de resolverse enteras. Las
+        listas anidadas (pestañas de un canal, watch?list=) y las redirecciones
+        se expanden igual hasta llegar a cada vídeo.
+        Devuelve (posición, total o None, entrada sin resolver).
+        """
+        # Vídeos entregados, vídeos previstos y listas abiertas de las que no se sabe el total
+        count = {"pos": 0, "expected": 1, "open": 0}
+
+        def expect(delta: int):
+            count["expected"] += delta
+            self._set_url_total(url_idx, count["expected"])
+
+        def expand(info: Optional[dict], label: str) -> Iterator[Tuple[int, Optional[int], dict]]:
+            try:
+                info = self._follow_redirects(ydl, info)
+            except Exception as e:
+                # Una entrada que falla no detiene el resto de la lista
+                self._report_error(label, e)
+                expect(-1)
+                return
+            if info is None:
+                self._skip(label)
+                expect(-1)
+                return
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                count["pos"] += 1
+                yield count["pos"], None if count["open"] else count["expected"], info
+                return
+            entries = info.get('entries')
+            total = info.get('playlist_count')
+            if total is None and isinstance(entries, (list, tuple)):
+                total = len(entries)
+            # La lista ocupa el lugar de sus entradas
+            expect(total - 1 if total is not None else -1)
+            if total is None:
+                count["open"] += 1
+            for entry in self._lazy_entries(entries):
+                if self.is_stopped():
+                    return
+                if total is None:
+                    expect(1)
+                if not entry:
+                    expect(-1)
+                    continue
+                yield from expand(entry, entry.get('title') or entry.get('id') or entry.get('url') or label)
+            if total is None:
+                count["open"] -= 1
+
+        yield from expand({'_type': 'url', 'url': url}, url)
+
+    def _process_entry(self, ydl, entry: dict) -> List[str]:
+        """Resuelve una entrada y la descarga (o la entrega para convertir al vuelo)"""
+        if self.on_stream_ready is not None:
+            # Resolver primero los formatos; solo se descarga lo que no se puede enviar a ffmpeg
+            resolved = ydl.process_ie_result(entry, download=False)
+            if resolved is None or ydl.in_download_archive(resolved):
+                self._skip(entry.get('title') or entry.get('id') or entry.get('url'))
+                return []
+            if self._is_streamable(resolved):
+                self._stream_ready(ydl, resolved)
+                return []
+            # Como download_with_info_file: descarga sin volver a extraer
+            resolved = ydl.process_ie_result(resolved, download=True)
+        else:
+            resolved = ydl.process_ie_result(entry, download=True)
+
+        # Rutas exactas según yt-dlp; las entradas omitidas por el archivo no tienen ninguna
+        paths = self._output_paths(resolved) if resolved else []
+        if not paths:
+            self._skip(entry.get('title') or entry.get('id') or entry.get('url'))
+        return paths
+
+    def _report_error(self, label: str, e: Exception):
+        error_msg = str(e)
+        self.progress.emit(f"Error descargando {label}: {error_msg}")
+
+        # Detectar errores específicos y dar soluciones
+        if "403" in error_msg or "Forbidden" in error_msg:
+            self.progress.emit("⚠️ Error 403: YouTube bloqueó la descarga.")
+            self.progress.emit("💡 Solución: Actualiza yt-dlp con: pip install -U yt-dlp")
+        elif "429" in error_msg or "Too Many Requests" in error_msg:
+            self.progress.emit("⚠️ Demasiadas peticiones. Espera unos minutos.")
+        elif "Private video" in error_msg or "unavailable" in error_msg:
+            self.progress.emit("⚠️ El video es privado o no está disponible.")
+
+    def _download_url(self, idx: int, url: str) -> List[str]:
+        """Descarga una URL (vídeo o lista) y devuelve los archivos obtenidos"""
+        downloaded_files = []
+        if self.is_stopped():
+            return downloaded_files
+
+        with self._host_slot(url):
+            if self.is_stopped():
+                return downloaded_files
+            # Entrada en curso de esta URL (el hook de progreso la consulta)
+            current = {"entry": None}
             try:
                 self.progress.emit(f"Descargando de: {url}")
-                self.progress_percent.emit(idx, 0.0)
-                
-                # Debug: Verificar si estamos en ejecutable
-                if getattr(sys, 'frozen', False):
-                    self.progress.emit(f"🔍 Modo: Ejecutable compilado (PyInstaller)")
-                else:
-                    self.progress.emit(f"🔍 Modo: Python directo")
-                
-                # Find FFmpeg for yt-dlp
-                ffmpeg_path = find_ffmpeg()
-                if not ffmpeg_path:
-                    error_msg = ("❌ ERROR CRÍTICO: FFmpeg no encontrado\n\n"
-                                "FFmpeg es necesario para procesar el audio descargado.\n\n"
-                                "SOLUCIONES:\n"
-                                "1. Instala FFmpeg: https://ffmpeg.org/download.html\n"
-                                "2. Añade FFmpeg a la variable PATH del sistema\n"
-                                "3. O coloca ffmpeg.exe en la carpeta 'bin' junto al ejecutable")
-                    self.progress.emit(error_msg)
-                    self.finished.emit(False, error_msg, [])
-                    return  # ← Detener completamente, no continuar
                 
                 # Progress hook for yt-dlp
                 def progress_hook(d):
+                    # Permite cancelar descargas en curso
+                    if self.is_stopped():
+                        raise yt_dlp.utils.DownloadCancelled()
+                    eidx = current["entry"]
+                    if eidx is None:
+                        return
                     if d['status'] == 'downloading':
                         try:
                             if 'total_bytes' in d:
@@ -324,257 +629,200 @@ class DownloadWorker(QThread):
                                 percent = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
                             else:
                                 percent = 0
-                            self.progress_percent.emit(idx, min(percent, 99.0))
+                            self.progress_percent.emit(eidx, min(percent, 99.0))
                         except:
                             pass
                     elif d['status'] == 'finished':
-                        self.progress_percent.emit(idx, 100.0)
+                        self.progress_percent.emit(eidx, 100.0)
                 
-                # yt-dlp options for best audio quality
-                # Configuración mejorada para evitar error 403 de YouTube
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                    'outtmpl': str(Path(self.output_dir) / '%(title)s.%(ext)s'),
-                    'quiet': False,
-                    'no_warnings': False,
-                    'extract_flat': False,
-                    'progress_hooks': [progress_hook],
-                    'ffmpeg_location': str(Path(ffmpeg_path).parent),
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'best',
-                        'preferredquality': '0',
-                    }],
-                    'prefer_ffmpeg': True,
-                    'keepvideo': False,
-                    'writethumbnail': False,
-                    'no_post_overwrites': False,
-                    
-                    # Soluciones para error 403 de YouTube
-                    'extractor_args': {
-                        'youtube': {
-                            'player_client': ['android', 'web'],
-                            'player_skip': ['webpage', 'configs'],
-                        }
-                    },
-                    
-                    # Headers para simular navegador real
-                    'http_headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                        'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-                        'Accept-Encoding': 'gzip, deflate',
-                        'DNT': '1',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1'
-                    },
-                    
-                    # Opciones adicionales para estabilidad
-                    'socket_timeout': 30,
-                    'retries': 3,
-                    'fragment_retries': 3,
-                    'skip_unavailable_fragments': True,
-                    'ignoreerrors': False,
-                    'nocheckcertificate': False,
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    
-                    # Get the downloaded file path - use yt-dlp's method
-                    if 'entries' in info:
-                        # Playlist
-                        for entry in info['entries']:
-                            if entry:
-                                # Use yt-dlp's prepare_filename to get the actual output file
-                                filename = ydl.prepare_filename(entry)
-                                # Check if file exists as-is
-                                if os.path.exists(filename):
-                                    downloaded_files.append(filename)
-                                    self.progress.emit(f"Descargado: {os.path.basename(filename)}")
-                                else:
-                                    # The postprocessor changes the extension
-                                    base = os.path.splitext(filename)[0]
-                                    # Try common audio extensions
-                                    for ext in ['.opus', '.m4a', '.mp3', '.webm', '.ogg', '.wav', '.flac', '.aac']:
-                                        potential_file = base + ext
-                                        if os.path.exists(potential_file):
-                                            downloaded_files.append(potential_file)
-                                            self.progress.emit(f"Descargado: {os.path.basename(potential_file)}")
-                                            break
-                    else:
-                        # Single video
-                        filename = ydl.prepare_filename(info)
-                        # Check if file exists as-is
-                        if os.path.exists(filename):
-                            downloaded_files.append(filename)
-                            self.progress.emit(f"Descargado: {os.path.basename(filename)}")
-                        else:
-                            # The postprocessor changes the extension
-                            base = os.path.splitext(filename)[0]
-                            # Try common audio extensions
-                            for ext in ['.opus', '.m4a', '.mp3', '.webm', '.ogg', '.wav', '.flac', '.aac']:
-                                potential_file = base + ext
-                                if os.path.exists(potential_file):
-                                    downloaded_files.append(potential_file)
-                                    self.progress.emit(f"Descargado: {os.path.basename(potential_file)}")
-                                    break
+                with yt_dlp.YoutubeDL(self._ydl_opts(progress_hook)) as ydl:
+                    for pos, total, entry in self._iter_entries(ydl, idx, url):
+                        if self.is_stopped():
+                            break
+                        eidx = current["entry"] = self._new_entry()
+                        label = entry.get('title') or entry.get('id') or entry.get('url') or url
+                        self.progress.emit(f"Entrada {pos} de {total or '?'}: {label}")
+                        self.progress_percent.emit(eidx, 0.0)
+                        try:
+                            for path in self._process_entry(ydl, entry):
+                                self._file_ready(path, downloaded_files)
+                        except yt_dlp.utils.DownloadCancelled:
+                            raise
+                        except Exception as e:
+                            # Un vídeo que falla no detiene el resto de la lista
+                            self._report_error(label, e)
+                        self.progress_percent.emit(eidx, 100.0)
                 
             except Exception as e:
-                error_msg = str(e)
-                self.progress.emit(f"Error descargando {url}: {error_msg}")
-                
-                # Detectar errores específicos y dar soluciones
-                if "403" in error_msg or "Forbidden" in error_msg:
-                    self.progress.emit("⚠️ Error 403: YouTube bloqueó la descarga.")
-                    self.progress.emit("💡 Solución: Actualiza yt-dlp con: pip install -U yt-dlp")
-                elif "429" in error_msg or "Too Many Requests" in error_msg:
-                    self.progress.emit("⚠️ Demasiadas peticiones. Espera unos minutos.")
-                elif "Private video" in error_msg or "unavailable" in error_msg:
-                    self.progress.emit("⚠️ El video es privado o no está disponible.")
-        
-        if downloaded_files:
-            self.finished.emit(True, f"Descargados {len(downloaded_files)} archivo(s)", downloaded_files)
-        else:
-            # Mensaje más descriptivo si no se descargó nada
-            if any("403" in str(e) for e in []):  # Simplificado
-                error_detail = ("No se descargó ningún archivo.\n\n"
-                               "Si obtuviste errores 403 de YouTube:\n"
-                               "1. Actualiza yt-dlp: pip install -U yt-dlp\n"
-                               "2. Reinicia la aplicación\n"
-                               "3. Intenta de nuevo")
-            else:
-                error_detail = "No se descargó ningún archivo. Revisa los errores arriba."
-            
-            self.finished.emit(False, error_detail, [])
+                self._report_error(url, e)
+
+        return downloaded_files
 
 
 # ---------------------------
-# Worker Thread
+# Tool Discovery Thread
 # ---------------------------
 
-class ConvertWorker(QThread):
-    progress_file = Signal(int, float)  # index, percent
-    file_done = Signal(int, bool, str)  # index, success, message
-    all_done = Signal()
+class ToolDiscoveryWorker(QThread):
+    """Busca ffmpeg/ffprobe en segundo plano para no retrasar la ventana"""
+    found = Signal(object, object, float)  # ffmpeg, ffprobe, segundos
+
+    def run(self):
+        t0 = time.perf_counter()
+        ffmpeg = find_ffmpeg()
+        ffprobe = find_ffprobe()
+        self.found.emit(ffmpeg, ffprobe, time.perf_counter() - t0)
+
+
+class FolderScanWorker(QThread):
+    """
+    Busca archivos de audio en una carpeta sin bloquear la interfaz.
+    Entrega los resultados por lotes para que la cola crezca sobre la marcha.
+    """
+    batch_found = Signal(list)  # rutas nuevas
+    scan_finished = Signal(int, bool)  # archivos encontrados, cancelado
 
-    def __init__(self, tasks: List[dict], ffmpeg_path: str, ffprobe_path: str):
+    BATCH_SIZE = 500
+    BATCH_INTERVAL = 0.25  # segundos máximos entre lotes
+
+    def __init__(self, folder: str, exts: Iterable[str]):
         super().__init__()
-        self.tasks = tasks
-        self.ffmpeg_path = ffmpeg_path
-        self.ffprobe_path = ffprobe_path
+        self.folder = folder
+        self.exts = set(exts)
         self._stop = False
-        self._stop_lock = Lock()
 
     def stop(self):
-        with self._stop_lock:
-            self._stop = True
-    
+        self._stop = True
+
     def is_stopped(self) -> bool:
-        with self._stop_lock:
-            return self._stop
+        return self._stop
 
     def run(self):
-        for idx, task in enumerate(self.tasks):
-            if self.is_stopped():
-                break
-
-            in_f = task["input"]
-            out_f = task["output"]
-            codec = task["codec"]
-            params = task["params"]  # dict
-            smart_copy = task.get("smart_copy", True)
-
-            # Ensure output folder exists
-            Path(out_f).parent.mkdir(parents=True, exist_ok=True)
-
-            # Probe duration for progress
-            dur = duration_seconds(self.ffprobe_path, in_f)
-            dur = max(dur, 0.001)
-
-            # Optional smart-copy: if container+codec already match and no resample requested, do stream copy
-            if smart_copy and qp.can_stream_copy(in_f, out_f, self.ffprobe_path, codec, params):
-                cmd = [
-                    self.ffmpeg_path, "-y", "-hide_banner", "-nostdin",
-                    "-i", in_f, "-map", "0:a:0", "-c:a", "copy",
-                ]
-                if task["params"].get("copy_meta", True):
-                    cmd += ["-map_metadata", "0", "-map_chapters", "0", "-map", "0:v:0?"]
-                    if codec == "mp3":
-                        cmd += ["-c:v", "mjpeg", "-id3v2_version", "3", "-write_id3v1", "1", "-disposition:v", "attached_pic"]
-                    else:
-                        cmd += ["-c:v", "copy", "-disposition:v", "attached_pic"]
+        found = 0
+        batch = []
+        last_emit = time.monotonic()
+        for path in iter_audio_files(self.folder, self.exts, should_stop=self.is_stopped):
+            batch.append(path)
+            now = time.monotonic()
+            if len(batch) >= self.BATCH_SIZE or now - last_emit >= self.BATCH_INTERVAL:
+                found += len(batch)
+                self.batch_found.emit(batch)
+                batch = []
+                last_emit = now
+        if batch and not self._stop:
+            found += len(batch)
+            self.batch_found.emit(batch)
+        self.scan_finished.emit(found, self._stop)
+
+
+class YtdlpUpdateCheckWorker(QThread):
+    """Comprueba en segundo plano si hay una versión nueva de yt-dlp"""
+    result = Signal(bool, str, str)  # needs_update, current_version, message
 
-                cmd += [out_f]
-                # Run without progress since copy is instant
-                p = subprocess.run(cmd, capture_output=True, text=True)
-                ok = (p.returncode == 0)
-                self.file_done.emit(idx, ok, "copiado sin recodificar" if ok else p.stderr.strip())
-                continue
+    def run(self):
+        try:
+            self.result.emit(*check_ytdlp_update())
+        except Exception as e:
+            self.result.emit(False, "unknown", f"Error verificando actualización: {e}")
 
-            # Build filterchain and codec options
-            codec_args, container_ext = qp.build_codec_args(codec, params, ffprobe=self.ffprobe_path, in_file=in_f)
 
-            # Prepare progress via -progress pipe:1
-            # Base mapping
-            cmd_base = [self.ffmpeg_path, "-y", "-hide_banner", "-nostdin", "-i", in_f, "-map", "0:a:0"]
+# ---------------------------
+# Worker Thread
+# ---------------------------
 
-            # Copiar metadatos
-            if params.get("copy_meta", True):
-                cmd_base += ["-map_metadata", "0", "-map_chapters", "0"]
+def format_eta(seconds: Optional[float]) -> str:
+    """Tiempo restante legible ("quedan ~3 min 20 s"); vacío si aún no se puede estimar"""
+    if seconds is None:
+        return ""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"quedan ~{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+    if seconds >= 60:
+        return f"quedan ~{seconds // 60} min {seconds % 60:02d} s"
+    return f"quedan ~{seconds} s"
 
-            # Portada sólo si el contenedor lo soporta
-            if params.get("copy_meta", True) and qp.supports_cover(codec):
-                cmd_base += ["-map", "0:v:0?"]
-                if codec == "mp3":
-                    cmd_base += ["-c:v", "mjpeg", "-id3v2_version", "3", "-write_id3v1", "1", "-disposition:v", "attached_pic"]
-                else:
-                    cmd_base += ["-c:v", "copy", "-disposition:v", "attached_pic"]
 
-            cmd         = cmd_base + codec_args + [out_f]
-            cmd_progress= cmd_base + ["-progress", "pipe:1"] + codec_args + [out_f]
+def open_journal() -> Optional[JobJournal]:
+    """Diario para un lote nuevo; sin él la conversión sigue, pero no se podrá reanudar"""
+    try:
+        return JobJournal()
+    except Exception as e:
+        print(f"No se pudo crear el diario de trabajos: {e}")
+        return None
 
-            try:
-                with subprocess.Popen(cmd_progress, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1) as proc:
-                    last_time = 0.0
-                    for line in proc.stdout:
-                        if self.is_stopped():
-                            proc.terminate()
-                            try:
-                                proc.wait(timeout=2)
-                            except subprocess.TimeoutExpired:
-                                proc.kill()
-                                proc.wait()
-                            break
-                        line = line.strip()
-                        if line.startswith("out_time_ms"):
-                            try:
-                                micro = float(line.split("=")[1])
-                                secs = micro / 1_000_000.0
-                                last_time = secs
-                                pct = min(100, max(0, (secs / dur) * 100.0))
-                                self.progress_file.emit(idx, pct)
-                            except:
-                                pass
-                        elif line == "progress=end":
-                            self.progress_file.emit(idx, 100.0)
-                    proc.wait()
-                    ok = (proc.returncode == 0)
-                    # On failure, capture stderr (limited to avoid memory issues)
-                    stderr = ""
-                    if proc.stderr:
-                        stderr_lines = proc.stderr.read().strip().split('\n')
-                        # Keep only last 20 lines to avoid memory issues with large outputs
-                        stderr = '\n'.join(stderr_lines[-20:])
-                    self.file_done.emit(idx, ok, "ok" if ok else stderr)
-            except subprocess.TimeoutExpired:
-                if proc.poll() is None:
-                    proc.kill()
-                    proc.wait()
-                self.file_done.emit(idx, False, "Proceso cancelado o timeout")
-            except Exception as e:
-                self.file_done.emit(idx, False, str(e))
 
+def open_trace() -> Optional[TaskTrace]:
+    """Traza de tiempos para un lote nuevo; sin ella la conversión sigue igual"""
+    try:
+        return TaskTrace()
+    except Exception as e:
+        print(f"No se pudo crear la traza de tiempos: {e}")
+        return None
+
+
+class ConvertWorker(QThread):
+    progress_snapshot = Signal(object)  # dict índice -> porcentaje de los trabajos en curso
+    file_done = Signal(int, bool, str)  # index, success, message
+    task_added = Signal(int, str)  # index, input (modo streaming)
+    all_done = Signal()
+
+    PUBLISH_INTERVAL_MS = 100  # 10 actualizaciones por segundo como máximo
+
+    def __init__(self, tasks: List[dict], ffmpeg_path: str, ffprobe_path: str, max_jobs: Optional[int] = None,
+                 manifest: Optional[JobManifest] = None, streaming: bool = False, dedupe: bool = False,
+                 journal: Optional[JobJournal] = None, trace: Optional[TaskTrace] = None):
+        super().__init__()
+        self.tasks = tasks
+        # El progreso se agrupa y se publica a ritmo fijo para no saturar la interfaz
+        self.progress = ProgressAggregator()
+        self.engine = ConvertEngine(
+            tasks, ffmpeg_path, ffprobe_path, max_jobs=max_jobs, manifest=manifest,
+            on_progress=self.progress.update,
+            on_file_done=self._file_done,
+            streaming=streaming,
+            dedupe=dedupe,
+            journal=journal,
+            trace=trace,
+        )
+        # El temporizador vive en el hilo de la interfaz
+        self._publish_timer = QTimer(self)
+        self._publish_timer.setInterval(self.PUBLISH_INTERVAL_MS)
+        self._publish_timer.timeout.connect(self._publish_progress)
+        self.started.connect(self._publish_timer.start)
+        self.finished.connect(self._publish_timer.stop)
+
+    def _file_done(self, idx: int, ok: bool, message: str):
+        self.progress.finish(idx)
+        self.file_done.emit(idx, ok, message)
+
+    def _publish_progress(self):
+        snapshot = self.progress.snapshot()
+        if snapshot is not None:
+            self.progress_snapshot.emit(snapshot)
+
+    def submit(self, task: dict) -> Optional[int]:
+        """Modo streaming: encola una tarea (se puede llamar desde otros hilos); None si ya se detuvo"""
+        idx = self.engine.submit(task)
+        if idx is not None:
+            self.task_added.emit(idx, task["input"])
+        return idx
+
+    def close(self):
+        """Modo streaming: no habrá más tareas"""
+        self.engine.close()
+
+    def stop(self):
+        self.engine.stop()
+    
+    def is_stopped(self) -> bool:
+        return self.engine.is_stopped()
+
+    def timing_summary(self) -> str:
+        """Resumen de tiempos de las tareas ejecutadas (vacío si no se convirtió nada)"""
+        return format_summary(summarize(list(self.engine.timings.values())))
+
+    def run(self):
+        self.engine.run()
         self.all_done.emit()
 
 
@@ -583,27 +831,32 @@ class ConvertWorker(QThread):
 # ---------------------------
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, profiler: Optional[StartupProfiler] = None):
         super().__init__()
         self.setWindowTitle("Audio Converter • Calidad Máxima por Defecto")
         self.resize(900, 600)
+        self.profiler = profiler or StartupProfiler(False, time.perf_counter())
 
-        self.ffmpeg = find_ffmpeg()
-        self.ffprobe = find_ffprobe()
+        # ffmpeg/ffprobe se localizan en segundo plano (ver on_tools_found)
+        self.ffmpeg: Optional[str] = None
+        self.ffprobe: Optional[str] = None
+        self.discovery_worker = ToolDiscoveryWorker()
+        self.discovery_worker.found.connect(self.on_tools_found)
+        self.discovery_worker.start()
 
-        if not self.ffmpeg or not self.ffprobe:
-            QMessageBox.critical(self, "FFmpeg no encontrado",
-                                 "No se encontró FFmpeg/FFprobe.\n"
-                                 "Añade ffmpeg a PATH o coloca los binarios en ./bin junto al ejecutable.")
         self.worker: Optional[ConvertWorker] = None
         self.download_worker: Optional[DownloadWorker] = None
-        
-        # Verificar actualización de yt-dlp al inicio (solo una vez al día)
-        if YT_DLP_AVAILABLE:
-            self.check_and_update_ytdlp()
+        self.update_check_worker: Optional[YtdlpUpdateCheckWorker] = None
+        self.scan_worker: Optional[FolderScanWorker] = None
 
         # Widgets
-        self.list_files = QListWidget()
+        # Cola de archivos: modelo + vista que solo pinta las filas visibles
+        self.file_queue = FileQueueModel(self)
+        self.list_files = QListView()
+        self.list_files.setModel(self.file_queue)
+        self.list_files.setItemDelegate(FileQueueDelegate(self.list_files))
+        self.list_files.setUniformItemSizes(True)
+        self.list_files.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
         btn_add = QPushButton("Añadir archivos")
         btn_add.clicked.connect(self.add_files)
@@ -612,16 +865,27 @@ class MainWindow(QMainWindow):
         btn_rm = QPushButton("Quitar seleccionados")
         btn_rm.clicked.connect(self.remove_selected)
         btn_clear = QPushButton("Limpiar lista")
-        btn_clear.clicked.connect(self.list_files.clear)
+        btn_clear.clicked.connect(self.file_queue.clear)
         
         # Download from URL section
         self.url_input = QTextEdit()
         self.url_input.setPlaceholderText("Introduce URL(s) para descargar (una por línea)\nEjemplo: https://www.youtube.com/watch?v=...")
         self.url_input.setMaximumHeight(80)
         
+        self.spin_downloads = QSpinBox()
+        self.spin_downloads.setRange(1, 32)
+        self.spin_downloads.setValue(DownloadWorker.DEFAULT_PARALLEL)
+        self.spin_downloads.setToolTip("Número de URLs que se descargan a la vez\n"
+                                       f"(como máximo {DownloadWorker.DEFAULT_PER_HOST} por servidor).")
+
         self.chk_convert_downloaded = QCheckBox("Convertir archivos descargados")
         self.chk_convert_downloaded.setChecked(False)
         self.chk_convert_downloaded.setToolTip("Si está marcado, los archivos descargados se añadirán a la lista para convertir.\nSi no, se guardarán directamente en su formato original.")
+        self.chk_stream_convert = QCheckBox("Convertir al vuelo (sin archivo intermedio)")
+        self.chk_stream_convert.setChecked(True)
+        self.chk_stream_convert.setToolTip("Con la conversión automática, el audio se envía directamente a FFmpeg\n"
+                                           "mientras se descarga, sin guardar el original en disco.\n"
+                                           "Los formatos que no lo permiten se descargan como siempre.")
         
         btn_download = QPushButton("Descargar desde URL")
         btn_download.clicked.connect(self.start_download)
@@ -639,9 +903,26 @@ class MainWindow(QMainWindow):
         self.format_combo = QComboBox()
         self.format_combo.addItems(qp.SUPPORTED_FORMATS_DISPLAY)
 
+        # Formatos adicionales: se codifican en el mismo proceso que el principal,
+        # decodificando cada archivo una sola vez
+        self.btn_extra_formats = QToolButton()
+        self.btn_extra_formats.setText("Formatos adicionales")
+        self.btn_extra_formats.setPopupMode(QToolButton.InstantPopup)
+        self.btn_extra_formats.setToolTip("Produce también estos formatos en la misma pasada.\n"
+                                          "Con más de un formato, cada uno va a su subcarpeta de la salida.")
+        extra_menu = QMenu(self.btn_extra_formats)
+        for fmt_display in qp.SUPPORTED_FORMATS_DISPLAY:
+            extra_menu.addAction(fmt_display).setCheckable(True)
+        self.btn_extra_formats.setMenu(extra_menu)
+
         self.quality_mode = QComboBox()
         self.quality_mode.addItems(["Máxima (recomendada)", "Personalizada"])
 
+        self.spin_jobs = QSpinBox()
+        self.spin_jobs.setRange(1, 256)
+        self.spin_jobs.setValue(default_job_count())
+        self.spin_jobs.setToolTip("Número de procesos ffmpeg que se ejecutan a la vez.")
+
         # Advanced parameters group
         adv_group = QGroupBox("Parámetros avanzados (solo si eliges Personalizada)")
         form = QFormLayout()
@@ -681,6 +962,24 @@ class MainWindow(QMainWindow):
         self.chk_copy_meta.setChecked(True)
         form.addRow("", self.chk_copy_meta)
 
+        self.chk_incremental = QCheckBox("Omitir archivos ya convertidos y sin cambios")
+        self.chk_incremental.setChecked(False)
+        self.chk_incremental.setToolTip("Guarda una huella de cada salida en la carpeta de destino\n"
+                                        "y no vuelve a convertir los archivos que no han cambiado.")
+        form.addRow("", self.chk_incremental)
+
+        self.chk_dedupe = QCheckBox("Convertir una sola vez los archivos idénticos")
+        self.chk_dedupe.setChecked(False)
+        self.chk_dedupe.setToolTip("Antes de convertir, detecta archivos con el mismo contenido en la lista.\n"
+                                   "Cada contenido se convierte una vez y el resto de salidas se crean\n"
+                                   "como enlaces (o copias) de la primera.")
+        form.addRow("", self.chk_dedupe)
+
+        self.ext_line = QLineEdit(" ".join(sorted(e.lstrip(".") for e in AUDIO_EXTENSIONS)))
+        self.ext_line.setToolTip("Extensiones que se buscan al añadir una carpeta,\n"
+                                 "separadas por espacios o comas")
+        form.addRow("Extensiones al añadir carpeta:", self.ext_line)
+
 
         adv_group.setLayout(form)
 
@@ -705,6 +1004,10 @@ class MainWindow(QMainWindow):
         # Convert controls
         btn_start = QPushButton("Convertir")
         btn_start.clicked.connect(self.start_convert)
+        btn_resume = QPushButton("Reanudar último lote")
+        btn_resume.setToolTip("Vuelve a convertir solo los archivos que no terminaron\n"
+                              "en el último lote (por ejemplo, tras un cierre inesperado)")
+        btn_resume.clicked.connect(self.resume_last_batch)
         
         self.btn_cancel = QPushButton("Cancelar")
         self.btn_cancel.clicked.connect(self.cancel_operation)
@@ -719,7 +1022,13 @@ class MainWindow(QMainWindow):
         download_layout = QVBoxLayout()
         download_layout.addWidget(QLabel("URL(s) para descargar:"))
         download_layout.addWidget(self.url_input)
+        dl_jobs_h = QHBoxLayout()
+        dl_jobs_h.addWidget(QLabel("Descargas simultáneas:"))
+        dl_jobs_h.addWidget(self.spin_downloads)
+        dl_jobs_h.addStretch(1)
+        download_layout.addLayout(dl_jobs_h)
         download_layout.addWidget(self.chk_convert_downloaded)
+        download_layout.addWidget(self.chk_stream_convert)
         download_layout.addWidget(btn_download)
         download_layout.addWidget(self.download_progress_label)
         download_group.setLayout(download_layout)
@@ -744,10 +1053,17 @@ class MainWindow(QMainWindow):
         fmt_h = QHBoxLayout()
         fmt_h.addWidget(QLabel("Formato destino:"))
         fmt_h.addWidget(self.format_combo)
+        fmt_h.addWidget(self.btn_extra_formats)
         fmt_h.addWidget(QLabel("Modo de calidad:"))
         fmt_h.addWidget(self.quality_mode)
         right.addLayout(fmt_h)
 
+        jobs_h = QHBoxLayout()
+        jobs_h.addWidget(QLabel("Conversiones simultáneas:"))
+        jobs_h.addWidget(self.spin_jobs)
+        jobs_h.addStretch(1)
+        right.addLayout(jobs_h)
+
         right.addWidget(adv_group)
         
         # Progress section with labels
@@ -766,6 +1082,7 @@ class MainWindow(QMainWindow):
         # Buttons layout
         buttons_h = QHBoxLayout()
         buttons_h.addWidget(btn_start)
+        buttons_h.addWidget(btn_resume)
         buttons_h.addWidget(self.btn_cancel)
         right.addLayout(buttons_h)
 
@@ -779,6 +1096,38 @@ class MainWindow(QMainWindow):
         self.quality_mode.currentIndexChanged.connect(self.on_quality_mode_changed)
         self.on_quality_mode_changed()
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not getattr(self, "_startup_done", False):
+            self._startup_done = True
+            # Tareas no urgentes cuando la ventana ya está en pantalla
+            QTimer.singleShot(0, self.after_first_show)
+
+    def after_first_show(self):
+        self.profiler.mark("primer ciclo de eventos")
+        # Verificar actualización de yt-dlp en segundo plano (resultado cacheado un día)
+        if YT_DLP_AVAILABLE:
+            self.update_check_worker = YtdlpUpdateCheckWorker()
+            self.update_check_worker.result.connect(self.check_and_update_ytdlp)
+            self.update_check_worker.start()
+
+    def on_tools_found(self, ffmpeg: Optional[str], ffprobe: Optional[str], seconds: float):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.profiler.note("búsqueda de ffmpeg/ffprobe", seconds)
+        if not self.ffmpeg or not self.ffprobe:
+            QMessageBox.critical(self, "FFmpeg no encontrado",
+                                 "No se encontró FFmpeg/FFprobe.\n"
+                                 "Añade ffmpeg a PATH o coloca los binarios en ./bin junto al ejecutable.")
+
+    def wait_for_tools(self):
+        """Si la búsqueda de ffmpeg sigue en curso, esperar a que termine"""
+        if self.discovery_worker.isRunning():
+            self.discovery_worker.wait()
+        if self.ffmpeg is None:
+            # El hilo puede haber terminado sin que se haya entregado aún su señal found
+            QApplication.processEvents()
+
     def on_quality_mode_changed(self):
         is_custom = (self.quality_mode.currentText().startswith("Personalizada"))
         # Enable/disable advanced fields
@@ -787,6 +1136,7 @@ class MainWindow(QMainWindow):
 
     def add_files(self):
         files, _ = QFileDialog.getOpenFileNames(self, "Selecciona archivos de audio")
+        valid = []
         for f in files:
             # Validar existencia y permisos
             if not os.path.exists(f):
@@ -799,31 +1149,55 @@ class MainWindow(QMainWindow):
                                   f"No se puede leer:\n{f}")
                 continue
             
-            # Evitar duplicados
-            items = [self.list_files.item(i).text() 
-                    for i in range(self.list_files.count())]
-            if f not in items:
-                self.list_files.addItem(f)
+            valid.append(f)
+        # El modelo descarta los duplicados
+        self.file_queue.add_paths(valid)
 
     def add_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Selecciona carpeta")
         if folder:
-            exts = {".wav",".aiff",".aif",".flac",".mp3",".m4a",".aac",".ogg",".opus",".wma",".mka",".mkv",".mp4",".mov"}
-            for root, _, files in os.walk(folder):
-                for name in files:
-                    if os.path.splitext(name)[1].lower() in exts:
-                        self.list_files.addItem(os.path.join(root, name))
+            self.start_folder_scan(folder)
+
+    def audio_extensions(self) -> set:
+        """Extensiones configuradas para añadir carpetas (por defecto, AUDIO_EXTENSIONS)"""
+        return parse_extensions(self.ext_line.text()) or set(AUDIO_EXTENSIONS)
+
+    def start_folder_scan(self, folder: str):
+        """Recorre la carpeta en segundo plano; los archivos se añaden por lotes"""
+        self._scan_added = 0
+        self._scan_found = 0
+        self.scan_worker = FolderScanWorker(folder, self.audio_extensions())
+        self.scan_worker.batch_found.connect(self.on_scan_batch)
+        self.scan_worker.scan_finished.connect(self.on_scan_finished)
+        self.set_ui_enabled(False)
+        self.lbl_current_file.setText(f"Buscando archivos en {folder}...")
+        self.scan_worker.start()
+
+    def on_scan_batch(self, paths: list):
+        self._scan_found += len(paths)
+        # add_paths descarta los que ya estaban en la cola
+        self._scan_added += self.file_queue.add_paths(paths)
+        self.lbl_total_status.setText(f"Encontrados: {self._scan_found} · añadidos: {self._scan_added}")
+
+    def on_scan_finished(self, found: int, cancelled: bool):
+        self.set_ui_enabled(True)
+        state = "✗ Búsqueda cancelada" if cancelled else "✓ Búsqueda completada"
+        self.lbl_current_file.setText(state)
+        duplicates = self._scan_found - self._scan_added
+        self.lbl_total_status.setText(f"Añadidos: {self._scan_added}"
+                                      + (f" ({duplicates} ya estaban en la lista)" if duplicates else ""))
 
     def remove_selected(self):
-        for item in self.list_files.selectedItems():
-            self.list_files.takeItem(self.list_files.row(item))
+        rows = [idx.row() for idx in self.list_files.selectionModel().selectedRows()]
+        self.file_queue.remove_rows(rows)
 
     def choose_out_dir(self):
         d = QFileDialog.getExistingDirectory(self, "Selecciona carpeta de salida")
         if d:
             self.out_dir_line.setText(d)
 
-    def build_tasks(self) -> Tuple[List[dict], str]:
+    def conversion_settings(self) -> Tuple[str, dict, bool, str]:
+        """Formato, parámetros, smart copy y carpeta de salida elegidos en la interfaz"""
         fmt_display = self.format_combo.currentText()
         fmt_key = qp.DISPLAY_TO_KEY[fmt_display]
 
@@ -848,32 +1222,71 @@ class MainWindow(QMainWindow):
             params = {"mode": "max", "copy_meta": bool(self.chk_copy_meta.isChecked())}
 
         smart_copy = bool(self.chk_smart_copy.isChecked())
+        return fmt_key, params, smart_copy, out_root
+
+    def extra_formats(self) -> List[str]:
+        """Formatos marcados en "Formatos adicionales", sin repetir el principal"""
+        main_display = self.format_combo.currentText()
+        return [qp.DISPLAY_TO_KEY[action.text()] for action in self.btn_extra_formats.menu().actions()
+                if action.isChecked() and action.text() != main_display]
 
-        tasks = []
-        for i in range(self.list_files.count()):
-            in_f = self.list_files.item(i).text()
-            ext = qp.EXT_FOR_FORMAT[fmt_key]
-            rel = Path(in_f).name
-            rel = os.path.splitext(rel)[0] + ext
-            out_f = str(Path(out_root) / rel)
-            tasks.append({
-                "input": in_f,
-                "output": out_f,
-                "codec": fmt_key,
-                "params": params,
-                "smart_copy": smart_copy
-            })
+    def build_tasks(self) -> Tuple[List[dict], str]:
+        fmt_key, params, smart_copy, out_root = self.conversion_settings()
+        inputs = self.file_queue.paths()
+        tasks = build_fanout_tasks(inputs, out_root, [fmt_key] + self.extra_formats(), params, smart_copy)
         return tasks, out_root
 
+    def start_pipeline(self) -> Tuple[Callable[[str], None], Callable[[str, HttpStreamSource, qp.ProbeRecord], None]]:
+        """
+        Descarga y conversión en paralelo: arranca un ConvertWorker en modo
+        streaming y devuelve las funciones con las que el DownloadWorker le
+        entrega cada archivo en cuanto termina de descargarse, o cada URL de
+        audio que ffmpeg convierte al vuelo.
+        """
+        fmt_key, params, smart_copy, out_root = self.conversion_settings()
+
+        self._pipeline_active = True
+        # El pipeline se cierra cuando terminan las dos partes
+        self._pipeline_pending = {"download", "convert"}
+        self._conversion_input_files = []
+        self._deleted_count = 0
+        self._files_total = 0
+        self._files_done = 0
+        self._conversion_success_count = 0
+
+        worker = ConvertWorker([], self.ffmpeg, self.ffprobe, max_jobs=self.spin_jobs.value(), streaming=True,
+                               journal=open_journal(), trace=open_trace())
+        worker.progress_snapshot.connect(self.on_progress_snapshot)
+        worker.file_done.connect(self.on_file_done)
+        worker.task_added.connect(self.on_task_added)
+        worker.all_done.connect(self.on_all_done)
+        self.worker = worker
+        self._batch_progress = BatchProgress(0, worker.engine.durations)
+        worker.start()
+
+        def sink(path: str):
+            worker.submit(build_tasks([path], out_root, fmt_key, params, smart_copy)[0])
+
+        def stream_sink(name: str, source: HttpStreamSource, probe: qp.ProbeRecord):
+            worker.submit(build_stream_task(name, source, probe, out_root, fmt_key, params, smart_copy))
+        return sink, stream_sink
+
+    def on_task_added(self, index: int, path: str):
+        self._files_total += 1
+        self._batch_progress.total = self._files_total
+        self._conversion_input_files.append(path)
+        self.file_queue.add_paths([path])
+
     def start_convert(self):
         """Inicia conversión con validaciones y mensajes al usuario"""
+        self.wait_for_tools()
         if not self.ffmpeg or not self.ffprobe:
             QMessageBox.critical(self, "FFmpeg no encontrado",
                                  "No se encontró FFmpeg/FFprobe.\n"
                                  "Añade ffmpeg a PATH o coloca los binarios en ./bin junto al ejecutable.")
             return
 
-        if self.list_files.count() == 0:
+        if self.file_queue.rowCount() == 0:
             QMessageBox.information(self, "Nada que hacer", "Añade al menos un archivo.")
             return
 
@@ -899,10 +1312,33 @@ class MainWindow(QMainWindow):
     
     def start_convert_internal(self):
         """Inicia conversión sin validaciones (para uso interno/automático)"""
-        if not self.ffmpeg or not self.ffprobe or self.list_files.count() == 0:
+        self.wait_for_tools()
+        if not self.ffmpeg or not self.ffprobe or self.file_queue.rowCount() == 0:
             return
 
         tasks, out_root = self.build_tasks()
+        self.run_tasks(tasks, out_root)
+
+    def resume_last_batch(self):
+        """Relanza las tareas que el último lote dejó sin terminar"""
+        self.wait_for_tools()
+        if not self.ffmpeg or not self.ffprobe:
+            QMessageBox.critical(self, "FFmpeg no encontrado", "No se encontró FFmpeg/FFprobe.")
+            return
+        journal = JobJournal.latest()
+        tasks = JobJournal.unfinished_tasks(journal) if journal else []
+        # Las entradas que ya no existen no se pueden repetir
+        tasks = [t for t in tasks if os.path.exists(t["input"])]
+        if not tasks:
+            QMessageBox.information(self, "Nada que reanudar", "El último lote terminó por completo.")
+            return
+        remove_stale_partials(tasks)
+        self.file_queue.add_paths(t["input"] for t in tasks)
+        self.run_tasks(tasks, str(Path(tasks[0]["output"]).parent))
+
+    def run_tasks(self, tasks: List[dict], out_root: str):
+        """Arranca el ConvertWorker para un lote de tareas"""
+        self.file_queue.reset_status()
         self.progress_current.setValue(0)
         self.progress_overall.setValue(0)
         self.lbl_current_file.setText("")
@@ -913,81 +1349,130 @@ class MainWindow(QMainWindow):
         for task in tasks:
             self._conversion_input_files.append(task["input"])
 
-        self.worker = ConvertWorker(tasks, self.ffmpeg, self.ffprobe)
-        self.worker.progress_file.connect(self.on_file_progress)
+        manifest = None
+        if self.chk_incremental.isChecked():
+            try:
+                manifest = JobManifest(out_root)
+            except Exception as e:
+                print(f"No se pudo abrir el manifiesto incremental: {e}")
+
+        self.worker = ConvertWorker(tasks, self.ffmpeg, self.ffprobe, max_jobs=self.spin_jobs.value(),
+                                    manifest=manifest, dedupe=self.chk_dedupe.isChecked(),
+                                    journal=open_journal(), trace=open_trace())
+        self.worker.progress_snapshot.connect(self.on_progress_snapshot)
         self.worker.file_done.connect(self.on_file_done)
         self.worker.all_done.connect(self.on_all_done)
         self._files_total = len(tasks)
         self._files_done = 0
+        self._batch_progress = BatchProgress(len(tasks), self.worker.engine.durations)
         self._conversion_success_count = 0
 
         self.set_ui_enabled(False)
         self.worker.start()
 
-    def on_file_progress(self, index: int, percent: float):
-        # Update current file info
-        if index < self.list_files.count():
-            filename = os.path.basename(self.list_files.item(index).text())
-            self.lbl_current_file.setText(f"Convirtiendo: {filename}")
+    def on_progress_snapshot(self, snapshot: dict):
+        """Progreso agrupado de los trabajos en curso (como mucho 10 veces por segundo)"""
+        if not snapshot:
+            return
+        tasks = self.worker.tasks if self.worker else []
+        for idx, pct in snapshot.items():
+            if idx < len(tasks):
+                self.file_queue.set_status(tasks[idx]["input"], STATUS_CONVERTING, pct)
+
+        # El trabajo más antiguo en curso ocupa la barra individual
+        index = min(snapshot)
+        percent = snapshot[index]
+        if self.worker and index < len(self.worker.tasks):
+            task = self.worker.tasks[index]
+            filename = task.get("label") or os.path.basename(task["input"])
+            others = len(snapshot) - 1
+            self.lbl_current_file.setText(f"Convirtiendo: {filename}" + (f" (+{others} más)" if others else ""))
         
         self.progress_current.setValue(int(percent))
         
-        # Update overall as average of completed + current
-        pct = int((self._files_done * 100 + percent) / max(1, self._files_total))
-        self.progress_overall.setValue(pct)
-        self.lbl_total_status.setText(f"Archivo {self._files_done + 1} de {self._files_total}")
+        # Global: audio terminado + parte convertida de los trabajos en curso, ponderado por duración
+        self._batch_progress.update(snapshot)
+        self.progress_overall.setValue(int(self._batch_progress.fraction() * 100))
+        self.lbl_total_status.setText(self._total_status(f"Archivo {self._files_done + 1} de {self._files_total}"))
+
+    def _total_status(self, text: str) -> str:
+        eta = format_eta(self._batch_progress.eta())
+        return f"{text} · {eta}" if eta else text
 
     def on_file_done(self, index: int, success: bool, message: str):
         self._files_done += 1
         self.progress_current.setValue(100)
-        pct = int((self._files_done * 100) / max(1, self._files_total))
-        self.progress_overall.setValue(pct)
-        self.lbl_total_status.setText(f"Completados: {self._files_done} de {self._files_total}")
+        # Las omitidas y las duplicadas no se convierten: no cuentan para el ritmo
+        converted = not (success and (message == SKIPPED_MESSAGE or message.startswith(DUPLICATE_MESSAGE)))
+        self._batch_progress.finish(index, converted)
+        self.progress_overall.setValue(int(self._batch_progress.fraction() * 100))
+        self.lbl_total_status.setText(self._total_status(f"Completados: {self._files_done} de {self._files_total}"))
+
+        if self.worker and index < len(self.worker.tasks):
+            status = STATUS_PENDING if message == CANCELLED_MESSAGE else STATUS_ERROR
+            if success:
+                status = STATUS_SKIPPED if message == SKIPPED_MESSAGE else STATUS_DONE
+            self.file_queue.set_status(self.worker.tasks[index]["input"], status, 100.0 if success else None)
         
         # Track successful conversions for automatic cleanup
         if success:
             if not hasattr(self, '_conversion_success_count'):
                 self._conversion_success_count = 0
             self._conversion_success_count += 1
-        else:
+            # En el pipeline, el original descargado se borra en cuanto se convierte
+            if getattr(self, '_pipeline_active', False):
+                input_file = self.worker.tasks[index]["input"]
+                try:
+                    if os.path.exists(input_file):
+                        os.remove(input_file)
+                        self._deleted_count += 1
+                except Exception as e:
+                    # Si no se puede eliminar, continuar sin error crítico
+                    print(f"No se pudo eliminar {input_file}: {e}")
+        elif message != CANCELLED_MESSAGE:
+            # Los trabajos cortados al cancelar no son errores: un aviso por cada uno sobraría
             QMessageBox.warning(self, "Error en conversión", f"Archivo #{index+1}: {message}")
 
     def on_all_done(self):
+        if getattr(self, '_pipeline_active', False):
+            self._pipeline_pending.discard("convert")
+            if self._pipeline_pending:
+                # Aún hay descargas en curso (p. ej. tras cancelar): cierra on_download_finished
+                return
         self.set_ui_enabled(True)
         self.lbl_current_file.setText("✓ Conversión completada")
         self.lbl_total_status.setText(f"✓ Completados: {self._files_total} de {self._files_total}")
+        if self.worker and not self.worker.is_stopped():
+            self.progress_overall.setValue(100)
         
         # Check if this was an automatic conversion after download
-        if hasattr(self, '_will_convert') and self._will_convert:
-            # Delete original downloaded files after successful conversion
-            deleted_count = 0
-            if hasattr(self, '_conversion_input_files'):
-                for input_file in self._conversion_input_files:
-                    try:
-                        if os.path.exists(input_file):
-                            os.remove(input_file)
-                            deleted_count += 1
-                    except Exception as e:
-                        # Si no se puede eliminar, continuar sin error crítico
-                        print(f"No se pudo eliminar {input_file}: {e}")
+        if getattr(self, '_pipeline_active', False):
+            # Los originales ya se eliminaron uno a uno en on_file_done
+            deleted_count = self._deleted_count
+            self._pipeline_active = False
             
-            # Clear the list after automatic conversion
-            self.list_files.clear()
+            # Quitar de la lista los archivos descargados (el resto no se tocó)
+            self.file_queue.remove_paths(self._conversion_input_files)
             
             success_count = getattr(self, '_conversion_success_count', 0)
-            message = f"Descarga y conversión finalizadas.\n\n"
+            cancelled = self.worker is not None and self.worker.is_stopped()
+            message = "Descarga y conversión canceladas.\n\n" if cancelled else "Descarga y conversión finalizadas.\n\n"
             message += f"✓ Convertidos: {success_count} archivo(s)\n"
             if deleted_count > 0:
                 message += f"✓ Archivos temporales eliminados: {deleted_count}"
+            timing = self.worker.timing_summary() if self.worker else ""
+            if timing:
+                message += f"\n{timing}"
             
             QMessageBox.information(self, "Proceso completado", message)
             self._will_convert = False  # Reset flag
             self._conversion_input_files = []  # Clear list
         else:
-            QMessageBox.information(self, "Listo", "Conversión finalizada.")
+            timing = self.worker.timing_summary() if self.worker else ""
+            QMessageBox.information(self, "Listo", "Conversión finalizada." + (f"\n\n{timing}" if timing else ""))
 
     def set_ui_enabled(self, en: bool):
-        self.findChild(QListWidget).setEnabled(en)
+        self.list_files.setEnabled(en)
         for btn in self.findChildren(QPushButton):
             # No deshabilitar el botón cancelar, solo habilitarlo/deshabilitarlo inversamente
             if btn != self.btn_cancel:
@@ -1000,12 +1485,35 @@ class MainWindow(QMainWindow):
             le.setEnabled(en)
         for chk in self.findChildren(QCheckBox):
             chk.setEnabled(en)
+        for tb in self.findChildren(QToolButton):
+            tb.setEnabled(en)
         
         # Habilitar botón cancelar solo durante operaciones
         self.btn_cancel.setEnabled(not en)
     
     def cancel_operation(self):
-        """Cancela la operación en curso (descarga o conversión)"""
+        """Cancela la operación en curso (descarga, conversión o búsqueda de archivos)"""
+        if self.scan_worker and self.scan_worker.isRunning():
+            # Los archivos ya encontrados se quedan en la lista
+            self.scan_worker.stop()
+            self.btn_cancel.setEnabled(False)
+
+        if getattr(self, '_pipeline_active', False):
+            # Descarga y conversión van juntas: se cancelan las dos a la vez
+            reply = QMessageBox.question(
+                self, "Cancelar descarga y conversión",
+                "¿Deseas cancelar la descarga y la conversión en curso?\n\n"
+                "Los archivos ya convertidos se mantendrán.",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            if reply == QMessageBox.Yes:
+                self.download_worker.stop()
+                self.worker.stop()
+                self.lbl_current_file.setText("✗ Operación cancelada por el usuario")
+                self.btn_cancel.setEnabled(False)
+            return
+
         if self.worker and self.worker.isRunning():
             reply = QMessageBox.question(
                 self, "Cancelar conversión",
@@ -1030,11 +1538,9 @@ class MainWindow(QMainWindow):
                 self.lbl_current_file.setText("✗ Descarga cancelada por el usuario")
                 self.btn_cancel.setEnabled(False)
     
-    def check_and_update_ytdlp(self):
-        """Verifica y actualiza yt-dlp si es necesario (solo una vez al día)"""
+    def check_and_update_ytdlp(self, needs_update: bool, current_ver: str, message: str):
+        """Ofrece actualizar yt-dlp si la comprobación en segundo plano lo indica"""
         try:
-            needs_update, current_ver, message = check_ytdlp_update()
-            
             if needs_update:
                 # Mostrar diálogo con información de actualización
                 msg = QMessageBox(self)
@@ -1113,7 +1619,13 @@ class MainWindow(QMainWindow):
                 self.download_worker.wait(5000)
                 if self.download_worker.isRunning():
                     self.download_worker.terminate()
-        
+
+        if self.scan_worker is not None:
+            self.scan_worker.stop()
+            self.scan_worker.wait(2000)
+        self.discovery_worker.wait(2000)
+        if self.update_check_worker is not None:
+            self.update_check_worker.wait(2000)
         event.accept()
     
     def start_download(self):
@@ -1123,13 +1635,6 @@ class MainWindow(QMainWindow):
                                "Instálalo con: pip install yt-dlp")
             return
         
-        # Verificar versión de yt-dlp (opcional pero recomendado)
-        try:
-            import yt_dlp
-            yt_dlp_version = yt_dlp.version.__version__
-        except:
-            yt_dlp_version = "desconocida"
-        
         url_text = self.url_input.toPlainText().strip()
         if not url_text:
             QMessageBox.information(self, "Sin URLs", "Introduce al menos una URL para descargar.")
@@ -1152,28 +1657,51 @@ class MainWindow(QMainWindow):
         
         self._download_total = len(urls)
         self._download_done = 0
+        self._download_completed = set()
         self._will_convert = self.chk_convert_downloaded.isChecked()
         
         self.set_ui_enabled(False)
         
-        self.download_worker = DownloadWorker(urls, out_dir)
+        self.wait_for_tools()
+        # Con conversión automática, cada archivo se convierte mientras siguen las descargas
+        sink = stream_sink = None
+        if self._will_convert and self.ffmpeg and self.ffprobe:
+            sink, stream_sink = self.start_pipeline()
+            if not self.chk_stream_convert.isChecked():
+                stream_sink = None
+        self.download_worker = DownloadWorker(urls, out_dir, ffmpeg_path=self.ffmpeg,
+                                              max_parallel=self.spin_downloads.value(),
+                                              on_file_ready=sink, on_stream_ready=stream_sink,
+                                              extract_audio=sink is None)
         self.download_worker.progress.connect(self.on_download_progress)
         self.download_worker.progress_percent.connect(self.on_download_percent)
+        self.download_worker.entries_total.connect(self.on_download_entries)
         self.download_worker.finished.connect(self.on_download_finished)
         self.download_worker.start()
     
     def on_download_progress(self, message: str):
         self.download_progress_label.setText(message)
-        self.lbl_current_file.setText(message)
+        # En el pipeline las etiquetas de progreso son de la conversión
+        if not getattr(self, '_pipeline_active', False):
+            self.lbl_current_file.setText(message)
     
+    def on_download_entries(self, total: int):
+        # Las listas se expanden sobre la marcha: el total crece con cada una
+        self._download_total = total
+
     def on_download_percent(self, index: int, percent: float):
+        # Las descargas van en paralelo: contar las entradas completadas, no la última
+        if percent >= 100.0:
+            self._download_completed.add(index)
+            self._download_done = len(self._download_completed)
+
+        if getattr(self, '_pipeline_active', False):
+            self.download_progress_label.setText(f"Descargadas: {self._download_done} de {self._download_total}")
+            return
+
         # Update individual progress
         self.progress_current.setValue(int(percent))
         
-        # If download is complete for this file, increment counter
-        if percent >= 100.0 and index >= self._download_done:
-            self._download_done = index + 1
-        
         # Update overall progress
         overall_pct = int((self._download_done * 100 + percent) / max(1, self._download_total))
         self.progress_overall.setValue(overall_pct)
@@ -1181,41 +1709,46 @@ class MainWindow(QMainWindow):
     
     def on_download_finished(self, success: bool, message: str, files: List[str]):
         self.download_progress_label.setText("")
+
+        if getattr(self, '_pipeline_active', False):
+            # Las conversiones pendientes terminan solas; on_all_done cierra el proceso
+            self.worker.close()
+            self.url_input.clear()
+            if success:
+                self.download_progress_label.setText(f"✓ {message}")
+            else:
+                QMessageBox.warning(self, "Error en descarga", message)
+            self._pipeline_pending.discard("download")
+            if not self._pipeline_pending:
+                # La conversión terminó antes (se canceló): cerrar ahora
+                self.on_all_done()
+            return
         
         if success:
             # Update progress indicators
             self.progress_overall.setValue(100)
             self.lbl_total_status.setText(f"✓ Descargadas: {len(files)} de {self._download_total}")
             
-            if self.chk_convert_downloaded.isChecked():
-                # Add downloaded files to conversion list
-                for f in files:
-                    self.list_files.addItem(f)
-                
-                self.lbl_current_file.setText("✓ Descarga completada. Iniciando conversión automática...")
-                
-                # Clear URL input
-                self.url_input.clear()
-                
-                # Start conversion automatically (without re-enabling UI)
-                # The UI will be enabled when conversion finishes
-                self.start_convert_internal()
-            else:
-                # Solo descargar, sin convertir
-                self.set_ui_enabled(True)
-                self.lbl_current_file.setText("✓ Descarga completada")
-                
-                # Mostrar archivos descargados
-                files_list = "\n".join([os.path.basename(f) for f in files[:5]])
-                if len(files) > 5:
-                    files_list += f"\n... y {len(files) - 5} más"
-                
-                QMessageBox.information(
-                    self, "Descarga completada", 
-                    f"Se descargaron {len(files)} archivo(s):\n\n{files_list}\n\n"
-                    f"Guardados en: {self.out_dir_line.text() or './downloads'}"
-                )
+            # Solo descargar, sin convertir
+            self.set_ui_enabled(True)
+            self.lbl_current_file.setText("✓ Descarga completada")
+            
+            if not files:
+                QMessageBox.information(self, "Descarga completada", message)
                 self.url_input.clear()
+                return
+
+            # Mostrar archivos descargados
+            files_list = "\n".join([os.path.basename(f) for f in files[:5]])
+            if len(files) > 5:
+                files_list += f"\n... y {len(files) - 5} más"
+            
+            QMessageBox.information(
+                self, "Descarga completada", 
+                f"Se descargaron {len(files)} archivo(s):\n\n{files_list}\n\n"
+                f"Guardados en: {self.out_dir_line.text() or './downloads'}"
+            )
+            self.url_input.clear()
         else:
             # ERROR en descarga
             self.set_ui_enabled(True)
@@ -1231,10 +1764,20 @@ def main():
     if sys.platform.startswith('win'):
         import multiprocessing
         multiprocessing.freeze_support()
+
+    argv = list(sys.argv)
+    profile = "--profile-startup" in argv
+    if profile:
+        argv.remove("--profile-startup")
+    profiler = StartupProfiler(profile, _IMPORT_T0)
+    profiler.mark("importaciones")
     
-    app = QApplication(sys.argv)
-    w = MainWindow()
+    app = QApplication(argv)
+    profiler.mark("QApplication")
+    w = MainWindow(profiler)
+    profiler.mark("MainWindow")
     w.show()
+    profiler.mark("show")
     sys.exit(app.exec())
 
 if __name__ == "__main__":
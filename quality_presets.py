@@ -7,30 +7,330 @@ Filosofía: por defecto priorizar transparencia y evitar pérdidas adicionales.
 - SOXR para resampling de alta calidad si se solicita.
 """
 import os
+import sys
 import json
+import sqlite3
 import subprocess
 from pathlib import Path
+from collections import OrderedDict
+from threading import Event, Lock
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
 
 # ---------------------------
 # Caché de Metadatos
 # ---------------------------
 
+# Carpeta de caché de la aplicación (compartida con el auto-actualizador de yt-dlp)
+CACHE_DIR = Path.home() / ".audio_converter_cache"
+
+# Análisis ffprobe simultáneos al precargar una cola (limitados por latencia, no por CPU)
+PREFETCH_WORKERS = 8
+
+
+def _file_signature(fpath: str) -> Optional[Tuple[int, int]]:
+    """(tamaño, mtime_ns) del archivo, o None si no se puede leer"""
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class ProbeRecord:
+    """
+    Metadatos compactos de un archivo: solo los campos que leen los presets.
+    Sustituye al JSON completo de ffprobe para que el caché ocupe poco.
+    """
+    __slots__ = ("codec_name", "sample_rate", "channels", "sample_fmt", "bit_rate", "duration")
+
+    def __init__(self, codec_name: Optional[str] = None, sample_rate: int = 0, channels: int = 0,
+                 sample_fmt: Optional[str] = None, bit_rate: int = 0, duration: float = 0.0):
+        self.codec_name = codec_name
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_fmt = sample_fmt
+        self.bit_rate = bit_rate
+        self.duration = duration
+
+    @classmethod
+    def from_ffprobe(cls, data: dict) -> "ProbeRecord":
+        """Extrae el primer stream de audio y la duración de la salida JSON de ffprobe"""
+        stream = {}
+        for st in data.get("streams") or []:
+            if st.get("codec_type", "audio") == "audio":
+                stream = st
+                break
+
+        def _int(v) -> int:
+            try:
+                return int(v or 0)
+            except (TypeError, ValueError):
+                return 0
+
+        try:
+            duration = float(data.get("format", {}).get("duration") or stream.get("duration") or 0)
+        except (TypeError, ValueError):
+            duration = 0.0
+
+        return cls(
+            codec_name=stream.get("codec_name"),
+            sample_rate=_int(stream.get("sample_rate")),
+            channels=_int(stream.get("channels")),
+            sample_fmt=stream.get("sample_fmt"),
+            bit_rate=_int(stream.get("bit_rate")),
+            duration=duration,
+        )
+
+    @classmethod
+    def from_ytdlp(cls, info: dict) -> "ProbeRecord":
+        """
+        Construye el registro con los campos del formato elegido por yt-dlp,
+        para convertir un stream remoto sin tener que analizarlo antes.
+        """
+        acodec = (info.get("acodec") or "").lower()
+        codec = acodec.split(".")[0] or None
+        codec = {"mp4a": "aac", "none": None}.get(codec, codec)
+
+        def _num(v, scale=1) -> int:
+            try:
+                return int(float(v) * scale) if v else 0
+            except (TypeError, ValueError):
+                return 0
+
+        try:
+            duration = float(info.get("duration") or 0)
+        except (TypeError, ValueError):
+            duration = 0.0
+
+        return cls(
+            codec_name=codec,
+            sample_rate=_num(info.get("asr")),
+            channels=_num(info.get("audio_channels")),
+            bit_rate=_num(info.get("abr") or info.get("tbr"), 1000),
+            duration=duration,
+        )
+
+    def is_empty(self) -> bool:
+        """True si el análisis falló o no hay stream de audio"""
+        return self.codec_name is None and self.duration <= 0
+
+    def stream_info(self) -> dict:
+        """Vista como dict del stream de audio (mismas claves que ffprobe)"""
+        if self.codec_name is None:
+            return {}
+        return {
+            "codec_name": self.codec_name,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "sample_fmt": self.sample_fmt,
+            "bit_rate": self.bit_rate,
+        }
+
+    def to_row(self) -> list:
+        return [self.codec_name, self.sample_rate, self.channels, self.sample_fmt, self.bit_rate, self.duration]
+
+    @classmethod
+    def from_row(cls, row: list) -> "ProbeRecord":
+        return cls(*row)
+
+    def footprint(self) -> int:
+        """Bytes aproximados que ocupa el registro en memoria"""
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, f)) for f in self.__slots__)
+
+
+class ProbeStore:
+    """
+    Caché persistente de resultados de ffprobe en SQLite.
+    Cada entrada se valida por (ruta, tamaño, mtime_ns): si el archivo cambia,
+    la entrada deja de ser válida y se vuelve a analizar.
+    La base de datos se abre al primer uso y se comparte entre hilos.
+    """
+    SCHEMA_VERSION = 2
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = Lock()
+        self._disabled = False
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        # Llamar con self._lock adquirido
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS probes")
+                conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as e:
+            # Sin caché persistente no se pierde funcionalidad: solo se vuelve a analizar
+            print(f"Caché de metadatos deshabilitada ({self.db_path}): {e}")
+            self._disabled = True
+        return self._conn
+
+    def get(self, fpath: str, size: int, mtime_ns: int) -> Optional[ProbeRecord]:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT data FROM probes WHERE path=? AND size=? AND mtime_ns=?",
+                    (fpath, size, mtime_ns)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        if row is None:
+            return None
+        try:
+            return ProbeRecord.from_row(json.loads(row[0]))
+        except (ValueError, TypeError):
+            return None
+
+    def put(self, fpath: str, size: int, mtime_ns: int, record: ProbeRecord):
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO probes (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+                    (fpath, size, mtime_ns, json.dumps(record.to_row(), separators=(",", ":")))
+                )
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
 class MetadataCache:
     """
-    Caché simple para evitar llamadas repetidas a ffprobe para el mismo archivo.
-    Reduce de 3+ llamadas a 1 por archivo.
+    Caché para evitar llamadas repetidas a ffprobe para el mismo archivo.
+    Reduce de 3+ llamadas a 1 por archivo y, con un ProbeStore, a 0 en
+    ejecuciones posteriores mientras el archivo no cambie.
+    En memoria guarda ProbeRecord compactos con desalojo LRU a partir de
+    max_entries, para que procesos largos no crezcan sin límite.
+    Seguro para usar desde varios hilos a la vez.
     """
-    def __init__(self):
-        self._cache = {}
-    
-    def get_or_probe(self, ffprobe: str, fpath: str) -> dict:
-        """Obtiene metadatos del caché o los obtiene con ffprobe"""
-        if fpath not in self._cache:
-            self._cache[fpath] = self._probe_all(ffprobe, fpath)
-        return self._cache[fpath]
+    DEFAULT_MAX_ENTRIES = 100_000
+
+    def __init__(self, store: Optional[ProbeStore] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._cache = OrderedDict()  # ruta -> (firma, ProbeRecord, bytes), orden LRU
+        self._inflight = {}  # ruta -> Event de un análisis en curso
+        self._lock = Lock()
+        self._store = store
+        self.max_entries = max(1, max_entries)
+        self.memory_bytes = 0  # tamaño aproximado de las entradas en memoria
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.probe_spawns = 0  # procesos ffprobe lanzados realmente
     
+    def get_or_probe(self, ffprobe: str, fpath: str) -> ProbeRecord:
+        """Obtiene metadatos del caché (memoria o disco) o los obtiene con ffprobe"""
+        sig = _file_signature(fpath)
+        with self._lock:
+            entry = self._cache.get(fpath)
+            if entry is not None and entry[0] == sig:
+                self._cache.move_to_end(fpath)
+                self.hits += 1
+                return entry[1]
+            # Si otro hilo ya está analizando este archivo, esperar su resultado
+            pending = self._inflight.get(fpath)
+            if pending is None:
+                self._inflight[fpath] = Event()
+
+        if pending is not None:
+            pending.wait()
+            return self.get_or_probe(ffprobe, fpath)
+
+        try:
+            record = None
+            if self._store is not None and sig is not None:
+                record = self._store.get(fpath, *sig)
+
+            if record is not None:
+                with self._lock:
+                    self.hits += 1
+            else:
+                with self._lock:
+                    self.misses += 1
+                record = ProbeRecord.from_ffprobe(self._probe_all(ffprobe, fpath))
+                # Solo se persisten análisis correctos
+                if not record.is_empty() and self._store is not None and sig is not None:
+                    self._store.put(fpath, sig[0], sig[1], record)
+
+            self._remember(fpath, sig, record)
+            return record
+        finally:
+            with self._lock:
+                done = self._inflight.pop(fpath)
+            done.set()
+
+    def prime(self, key: str, record: ProbeRecord):
+        """Registra metadatos ya conocidos (p. ej. de yt-dlp) sin lanzar ffprobe"""
+        self._remember(key, _file_signature(key), record)
+
+    def _remember(self, fpath: str, sig, record: ProbeRecord):
+        """Inserta en memoria y desaloja las entradas menos usadas si se supera el límite"""
+        size = sys.getsizeof(fpath) + record.footprint()
+        with self._lock:
+            old = self._cache.pop(fpath, None)
+            if old is not None:
+                self.memory_bytes -= old[2]
+            self._cache[fpath] = (sig, record, size)
+            self.memory_bytes += size
+            while len(self._cache) > self.max_entries:
+                _, evicted = self._cache.popitem(last=False)
+                self.memory_bytes -= evicted[2]
+                self.evictions += 1
+
+    def prefetch(self, ffprobe: str, paths: List[str], max_workers: int = PREFETCH_WORKERS,
+                 on_ready: Optional[Callable[[str, ProbeRecord], None]] = None) -> ThreadPoolExecutor:
+        """
+        Analiza en segundo plano una lista de archivos para llenar el caché
+        antes de que los necesiten los codificadores. Los archivos se analizan
+        en el orden recibido; on_ready(ruta, metadatos) se llama, desde el hilo
+        del análisis, en cuanto cada uno está listo. Devuelve el executor: llamar
+        a shutdown(wait=False, cancel_futures=True) para abandonar lo pendiente.
+        """
+        pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ffprobe")
+        seen = set()
+        for fpath in paths:
+            if fpath in seen:
+                continue
+            seen.add(fpath)
+            pool.submit(self._prefetch_one, ffprobe, fpath, on_ready)
+        return pool
+
+    def _prefetch_one(self, ffprobe: str, fpath: str, on_ready: Optional[Callable[[str, ProbeRecord], None]]):
+        record = self.get_or_probe(ffprobe, fpath)
+        if on_ready is not None:
+            on_ready(fpath, record)
+
     def _probe_all(self, ffprobe: str, fpath: str) -> dict:
         """Una sola llamada a ffprobe para obtener todos los metadatos necesarios"""
+        with self._lock:
+            self.probe_spawns += 1
         cmd = [
             ffprobe, "-v", "error",
             "-show_entries", "stream:format",
@@ -45,26 +345,40 @@ class MetadataCache:
             return {}
     
     def get_stream_info(self, ffprobe: str, fpath: str) -> dict:
-        """Obtiene info del primer stream de audio"""
-        data = self.get_or_probe(ffprobe, fpath)
-        if "streams" in data and data["streams"]:
-            return data["streams"][0]
-        return {}
+        """Obtiene info del primer stream de audio (ignora portadas y vídeo)"""
+        return self.get_or_probe(ffprobe, fpath).stream_info()
     
     def get_duration(self, ffprobe: str, fpath: str) -> float:
         """Obtiene duración del formato"""
-        data = self.get_or_probe(ffprobe, fpath)
-        try:
-            return float(data.get("format", {}).get("duration", 0))
-        except:
-            return 0.0
+        return self.get_or_probe(ffprobe, fpath).duration
+
+    def footprint(self) -> int:
+        """Bytes aproximados que ocupa el caché en memoria"""
+        with self._lock:
+            return self.memory_bytes
+
+    def stats(self) -> dict:
+        """Contadores de aciertos/fallos y ocupación del caché"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "probe_spawns": self.probe_spawns,
+                "entries": len(self._cache),
+                "evictions": self.evictions,
+                "memory_bytes": self.memory_bytes,
+            }
     
     def clear(self):
-        """Limpia el caché (útil si se procesan muchos archivos)"""
-        self._cache.clear()
+        """Limpia el caché en memoria (útil si se procesan muchos archivos)"""
+        with self._lock:
+            self._cache.clear()
+            self.memory_bytes = 0
 
-# Instancia global del caché
-_metadata_cache = MetadataCache()
+# Instancia global del caché (persistente en CACHE_DIR).
+# Es el único punto desde el que se lanza ffprobe: la interfaz, los presets
+# y cualquier otro llamador deben pasar por aquí.
+_metadata_cache = MetadataCache(store=ProbeStore(CACHE_DIR / "probe_cache.sqlite3"))
 
 SUPPORTED_FORMATS_DISPLAY = [
     "WAV (PCM)",
@@ -163,22 +477,6 @@ def _match_policy_for_lossy(ffprobe: str, in_file: str, target_codec: str) -> di
 
     return {}
 
-def _probe(ffprobe: str, fpath: str, entries: str, select: str = "a:0") -> dict:
-    cmd = [
-        ffprobe, "-v", "error",
-        "-select_streams", select,
-        "-show_entries", entries,
-        "-of", "json",
-        fpath
-    ]
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    if p.returncode != 0:
-        return {}
-    try:
-        return json.loads(p.stdout)
-    except:
-        return {}
-
 def _stream_info(ffprobe: str, fpath: str) -> dict:
     """Obtiene info del stream usando caché"""
     return _metadata_cache.get_stream_info(ffprobe, fpath)
@@ -362,6 +660,11 @@ def build_codec_args(fmt_key: str, params: dict, ffprobe: str, in_file: str) ->
 
     return ["-c:a", "copy"], EXT_FOR_FORMAT.get(fmt_key, ".out")
 
+# Decodificadores de ffmpeg con hilos por tramas. Los codificadores de audio
+# (LAME, libvorbis, libopus, aac, flac, alac) trabajan todos en un solo hilo,
+# así que lo único que puede repartirse entre núcleos es la decodificación.
+THREADED_DECODERS = {"flac", "alac"}
+
 def supports_cover(fmt_key: str) -> bool:
     # mp3 (ID3 APIC), m4a/aac/alac (atoms), flac (PICTURE)
     return fmt_key in ("mp3", "aac", "alac", "flac")
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Traza de tiempos por tarea.
+Cada conversión deja un registro con el desglose de su tiempo: análisis,
+espera en cola, tiempo de ffmpeg, CPU del proceso hijo, bytes escritos y
+la velocidad que informa ffmpeg (speed=). Los registros de un lote van a un
+archivo JSON lines en el caché de la aplicación para localizar entradas
+problemáticas y comprobar el efecto de los ajustes.
+"""
+import os
+import json
+import time
+from pathlib import Path
+from threading import Lock
+from typing import List
+
+import quality_presets as qp
+
+TRACE_DIR = qp.CACHE_DIR / "traces"
+
+
+class TaskTrace:
+    """Traza de un lote. Seguro para llamarlo desde varios hilos"""
+    KEEP_BATCHES = 10  # trazas antiguas que se conservan
+
+    def __init__(self, trace_dir: Path = TRACE_DIR):
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}.jsonl"
+        self.path = trace_dir / name
+        self._lock = Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._prune(trace_dir)
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _prune(self, trace_dir: Path):
+        old = sorted(trace_dir.glob("*.jsonl"))[:-self.KEEP_BATCHES]
+        for path in old:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def summarize(records: List[dict], slowest: int = 3) -> dict:
+    """Totales de un lote y las entradas con menor velocidad (segundos de audio por segundo de ffmpeg)"""
+    ran = [r for r in records if r.get("encode_s") is not None]
+
+    def total(field: str, rows: List[dict]) -> float:
+        # Los formatos de un mismo grupo comparten proceso: cada uno cuenta su parte
+        return sum((r.get(field) or 0.0) / r.get("group_size", 1) for r in rows)
+
+    timed = [r for r in ran if r.get("realtime_factor")]
+    encode = total("encode_s", timed)
+    by_input = {}
+    for r in sorted(timed, key=lambda r: r["realtime_factor"]):
+        by_input.setdefault(r["input"], r["realtime_factor"])
+    return {
+        "tasks": len(ran),
+        "probe_s": round(total("probe_s", ran), 3),
+        "queue_wait_s": round(sum(r.get("queue_wait_s") or 0.0 for r in ran), 3),
+        "encode_s": round(total("encode_s", ran), 3),
+        "cpu_s": round(total("cpu_user_s", ran) + total("cpu_sys_s", ran), 3),
+        "output_bytes": sum(r.get("output_bytes") or 0 for r in ran),
+        "realtime_factor": round(total("duration_s", timed) / encode, 2) if encode > 0 else None,
+        "slowest": [{"input": path, "realtime_factor": rtf} for path, rtf in list(by_input.items())[:slowest]],
+    }
+
+
+def format_summary(summary: dict) -> str:
+    """Resumen legible de summarize() para mostrar al terminar un lote"""
+    if not summary["tasks"]:
+        return ""
+    lines = [
+        f"Tiempo de ffmpeg: {summary['encode_s']:.1f} s (CPU {summary['cpu_s']:.1f} s), "
+        f"análisis {summary['probe_s']:.1f} s, espera en cola {summary['queue_wait_s']:.1f} s",
+    ]
+    if summary["realtime_factor"]:
+        lines.append(f"Velocidad media: {summary['realtime_factor']:.1f}x tiempo real, "
+                     f"{summary['output_bytes'] / (1024 * 1024):.1f} MB escritos")
+    if summary["slowest"]:
+        slow = ", ".join(f"{os.path.basename(s['input'])} ({s['realtime_factor']:.1f}x)" for s in summary["slowest"])
+        lines.append(f"Más lentos: {slow}")
+    return "\n".join(lines)
+